@@ -1,20 +1,50 @@
-from collections import defaultdict
-from io import BytesIO
+import json
+import logging
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from itertools import chain, islice
 
+from django.apps import apps as django_apps
 from django.conf import settings
 from django.core import serializers
-from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models import CharField, Exists, OuterRef
+from django.db.models.deletion import Collector
+from django.db.models.functions import Cast
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 import requests
 
+import data_sync.bulk
+import data_sync.columns
+import data_sync.compression
+import data_sync.diffing
+import data_sync.files
 import data_sync.managers
-from data_sync.exceptions import GrabExportError
+import data_sync.metrics
+import data_sync.signals
+from data_sync.exceptions import GrabExportError, PagedExportNotSupported
 from data_sync.registration import register_model
 from data_sync import url_constants
 
 
 default_app_config = 'data_sync.apps.DataSyncConfig'
 
+logger = logging.getLogger('django.data_sync')
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+IMPORT_STREAM_CHUNK_SIZE = 64 * 1024
+# pulled pages bigger than this (bytes) are buffered on disk
+PULL_PAGE_SPOOL_MAX_SIZE = 1024 * 1024
+COMPARE_DATA_NATURAL_KEYS_SAMPLE_SIZE = 100
+
 
 """
 Changing natural key means the object will be deleted.
@@ -34,23 +64,417 @@ def get_export_request_headers():
     } if settings.DATA_SYNC_EXPORT_TOKEN else None
 
 
-def pull_data(data_source_url):
+def _get_export(data_source_url, params, session=None):
+    url = f'{data_source_url}/{url_constants.EXPORT}'
+    headers = {
+        **(get_export_request_headers() or {}),
+        # compressed responses are decoded as they are streamed
+        'Accept-Encoding': data_sync.compression.get_accept_encoding()
+    }
+    try:
+        response = (session or requests).get(
+            url,
+            params=params,
+            headers=headers,
+            timeout=settings.DATA_SYNC_PULL_TIMEOUT,
+            stream=True
+        )
+        response.raise_for_status()
+    except Exception as e:
+        raise GrabExportError()
+    return response
+
+
+def _get_export_params(since=None, model=None, after=None, limit=None,
+                       scope=None):
+    params = {'format': 'ndjson'}
+    if settings.DATA_SYNC_PULL_COLUMNS:
+        # ignored by source envs not supporting it, both formats are loaded
+        params['columns'] = 1
+    if since is not None:
+        params['since'] = since.isoformat()
+    if scope is not None:
+        params['scope'] = json.dumps(scope, cls=DjangoJSONEncoder)
+    if model is not None:
+        params['model'] = model
+        if after is not None:
+            params['after'] = after
+        if limit is not None:
+            params['limit'] = limit
+    return params
+
+
+def pull_data(data_source_url, since=None, model=None, after=None,
+              limit=None, session=None, scope=None, metrics=None):
     """
     :param data_source_url: env_url from DataSource
-    :return: tuple of exported data
+    :param since: datetime, only pull objects changed or deleted since then
+        (for models registered with updated_field)
+    :param model: label of the only model to pull, a page of at most limit
+        objects after the cursor after, see export_stream(). Raises
+        PagedExportNotSupported if the source env does not export pages,
+        before anything is yielded
+    :param scope: only pull these models and objects, see
+        data_sync.registration.get_scope()
+    :param metrics: SyncMetrics, pull stage counters are added to it
+    :return: iterator of serialized objects (python dicts), consumed lazily
+        from the streamed export
     """
-    url = f'{data_source_url}/{url_constants.EXPORT}'
+    response = _get_export(
+        data_source_url,
+        _get_export_params(since, model, after, limit, scope),
+        session
+    )
+
+    if not response.headers.get('Content-Type', '').startswith(NDJSON_CONTENT_TYPE):  # noqa
+        # source env does not support streaming export yet,
+        # it returns a list of serialized objects strings
+        if model is not None:
+            response.close()
+            raise PagedExportNotSupported()
+        try:
+            data = response.json()
+        except Exception:
+            raise GrabExportError()
+        return _iter_serialized_objects(data)
+
+    lines = _iter_ndjson(response, metrics)
+    if model is None:
+        return lines
+
+    # a page starts with the metadata line echoing the model, source envs
+    # exporting everything at once do not echo it
+    export_metadata = next(lines, None)
+    if not isinstance(export_metadata, dict) or export_metadata.get('model') != model:  # noqa
+        lines.close()
+        raise PagedExportNotSupported()
+    return chain([export_metadata], lines)
+
+
+def _download_page(session, data_source_url, model, since, after, limit,
+                   scope, metrics=None, on_cursor=None):
+    """
+    Download a page of model to a temporary file
+
+    :param on_cursor: called with the cursor of the next page as soon as it's
+        known, before the page is downloaded, not called on the last page
+    :return: tuple of the temporary file and the cursor of the next page,
+        None if it's the last page
+    """
+    start = time.perf_counter()
+    response = _get_export(
+        data_source_url,
+        _get_export_params(since, model, after, limit, scope),
+        session
+    )
+    with response:
+        lines = data_sync.compression.iter_lines(
+            response, IMPORT_STREAM_CHUNK_SIZE
+        )
+        try:
+            export_metadata = json.loads(next(lines))
+        except Exception:
+            raise PagedExportNotSupported()
+        if not isinstance(export_metadata, dict) or export_metadata.get('model') != model:  # noqa
+            raise PagedExportNotSupported()
+
+        cursor = export_metadata.get('cursor')
+        if cursor is not None and on_cursor is not None:
+            on_cursor(cursor)
+
+        f = tempfile.SpooledTemporaryFile(max_size=PULL_PAGE_SPOOL_MAX_SIZE)
+        f.write(_dumps_line(export_metadata).encode())
+        try:
+            for line in lines:
+                if line:
+                    f.write(line + b'\n')
+        except Exception:
+            f.close()
+            raise GrabExportError()
+
+    if metrics is not None:
+        metrics.add(
+            'pull', pages=1, bytes=f.tell(),
+            elapsed=time.perf_counter() - start
+        )
+    f.seek(0)
+    return f, cursor
+
+
+class _PageDownloads:
+    """
+    Downloads of the pages of a paged export, see pull_data_paged()
+
+    The next page of a model is known once the metadata line of the current
+    one is read. Up to `ahead` pages are downloaded, or being downloaded, and
+    not read yet, pages of the models read first are downloaded first. A page
+    to read that is not downloaded yet is downloaded anyway.
+    """
+
+    def __init__(self, executor, download, ahead):
+        """
+        :param download: called with a model index, the cursor of a page and
+            on_cursor, see _download_page()
+        """
+        self.executor = executor
+        self.download = download
+        self.ahead = ahead
+        self.lock = threading.Lock()
+        # model index -> cursor of its next page, not submitted yet
+        self.pending = {}
+        # model index -> futures of its next pages, in page order
+        self.futures = defaultdict(deque)
+        # pages submitted and not read yet
+        self.count = 0
+        self.stopped = False
+
+    def add(self, index, cursor=None):
+        """
+        Add the next page of model index, cursor is None for the first one
+        """
+        with self.lock:
+            if not self.stopped:
+                self.pending[index] = cursor
+                self._submit_pending()
+
+    def get(self, index):
+        """
+        :return: future of the next page of model index, None if every page
+            was read
+        """
+        with self.lock:
+            if not self.futures[index] and index in self.pending:
+                self._submit(index)
+            if not self.futures[index]:
+                return None
+            return self.futures[index].popleft()
+
+    def done(self):
+        """
+        A page returned by get() is read
+        """
+        with self.lock:
+            self.count -= 1
+            self._submit_pending()
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            self.pending.clear()
+
+    def _submit_pending(self):
+        while self.pending and self.count < self.ahead:
+            self._submit(min(self.pending))
+
+    def _submit(self, index):
+        self.futures[index].append(self.executor.submit(
+            self._download, index, self.pending.pop(index)
+        ))
+        self.count += 1
 
+    def _download(self, index, cursor):
+        if self.stopped:
+            return None, None
+        return self.download(index, cursor, partial(self.add, index))
+
+
+def _iter_pages(pages, models_count, executor, session):
     try:
-        # will convert to python list of serialized objects strings
-        data = requests.get(
-            url,
-            headers=get_export_request_headers(),
-            timeout=10
-        ).json()
-    except Exception as e:
+        for index in range(models_count):
+            future = pages.get(index)
+            while future is not None:
+                f, _ = future.result()
+                with f:
+                    for line in f:
+                        if line.strip():
+                            yield json.loads(line)
+                pages.done()
+                future = pages.get(index)
+    finally:
+        # consumed, failed or closed early, do not download the rest
+        pages.stop()
+        executor.shutdown(wait=True)
+        session.close()
+
+
+def pull_data_paged(data_source_url, since=None, page_size=None,
+                    concurrency=None, scope=None, metrics=None, ahead=None):
+    """
+    Same as pull_data(), except registered models are pulled page by page,
+    up to concurrency (defaults to DATA_SYNC_PULL_CONCURRENCY) pages at once
+    over a pooled session, instead of in one long request.
+
+    Pages of page_size objects (defaults to DATA_SYNC_PAGE_SIZE) are
+    downloaded ahead to temporary files, up to ahead pages (defaults to
+    DATA_SYNC_PULL_PAGES_AHEAD) not read yet. Serialized objects of a page
+    are yielded as soon as it's downloaded, in registration order, so saving
+    a model overlaps with downloading the next ones.
+
+    Raises PagedExportNotSupported if the source env does not support paged
+    export, before anything is yielded.
+    """
+    if page_size is None:
+        page_size = settings.DATA_SYNC_PAGE_SIZE
+    if concurrency is None:
+        concurrency = settings.DATA_SYNC_PULL_CONCURRENCY
+    if ahead is None:
+        ahead = settings.DATA_SYNC_PULL_PAGES_AHEAD
+
+    labels = [Model._meta.label_lower for Model in get_scoped_models(scope)]
+
+    def download(index, cursor, on_cursor):
+        return _download_page(
+            session, data_source_url, labels[index], since, cursor,
+            page_size, scope, metrics, on_cursor
+        )
+
+    session = data_sync.files.get_session(concurrency)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pages = _PageDownloads(executor, download, max(ahead, 1))
+    for index in range(len(labels)):
+        pages.add(index)
+
+    # every model comes from the same source env, the first page tells if
+    # paged export is supported, it's always submitted first
+    try:
+        if labels:
+            pages.futures[0][0].result()
+    except BaseException:
+        pages.stop()
+        executor.shutdown(wait=True)
+        session.close()
+        raise
+    return _iter_pages(pages, len(labels), executor, session)
+
+
+def _iter_ndjson(response, metrics=None):
+    size = 0
+    try:
+        for line in data_sync.compression.iter_lines(
+            response, IMPORT_STREAM_CHUNK_SIZE
+        ):
+            if line:
+                size += len(line) + 1
+                yield json.loads(line)
+    except Exception:
         raise GrabExportError()
-    return data
+    finally:
+        response.close()
+        if metrics is not None:
+            # no elapsed, downloading overlaps with applying
+            metrics.add('pull', pages=1, bytes=size)
+
+
+def _iter_serialized_objects(pulled_data, export_info=None):
+    """
+    Accepts both serialized objects strings per model (export()) and
+    serialized objects (export_stream()), yields serialized objects.
+
+    Export metadata lines of export_stream() are collected into export_info
+
+    Rows of the columnar format are yielded as serialized objects, see
+    data_sync.columns
+    """
+    header = None
+    for serialized_objects in pulled_data:
+        if isinstance(serialized_objects, str):
+            yield from json.loads(serialized_objects)
+        elif isinstance(serialized_objects, list):
+            yield data_sync.columns.to_serialized_object(
+                header, serialized_objects
+            )
+        elif 'columns' in serialized_objects:
+            header = serialized_objects
+        elif 'fields' in serialized_objects:
+            yield serialized_objects
+        elif export_info is None:
+            continue
+        elif 'deleted' in serialized_objects:
+            export_info['deleted'][serialized_objects['model']].extend(
+                serialized_objects['deleted']
+            )
+        elif 'watermark' in serialized_objects:
+            # paged pulls have one metadata line per page, the earliest
+            # watermark covers all of them
+            watermark = parse_datetime(serialized_objects['watermark'])
+            if export_info['watermark'] is None or watermark < export_info['watermark']:  # noqa
+                export_info['watermark'] = watermark
+            export_info['incremental'].extend(
+                label
+                for label in serialized_objects['incremental']
+                if label not in export_info['incremental']
+            )
+            export_info['model'] = serialized_objects.get('model')
+            export_info['cursor'] = serialized_objects.get('cursor')
+
+
+def _new_export_info():
+    """
+    Export metadata collected by _iter_serialized_objects(), defaults are
+    the ones of a full export
+    """
+    return {
+        'watermark': None,
+        'incremental': [],
+        'deleted': defaultdict(list),
+        'model': None,
+        'cursor': None
+    }
+
+
+def _new_changes():
+    """
+    Saved pks and deleted natural keys of fast loaded models, collected while
+    applying pulled data, see send_data_sync_completed()
+    """
+    return {
+        'saved': defaultdict(set),
+        'deleted': defaultdict(list)
+    }
+
+
+def _iter_batches(serialized_objects, batch_size):
+    """
+    Group consecutive serialized objects of the same model into lists of at
+    most batch_size elements
+    """
+    batch = []
+    for serialized_object in serialized_objects:
+        if batch and (
+            len(batch) >= batch_size
+            or batch[0]['model'] != serialized_object['model']
+        ):
+            yield batch
+            batch = []
+        batch.append(serialized_object)
+
+    if batch:
+        yield batch
+
+
+def get_scoped_models(scope=None):
+    """
+    Registered models of scope in dependency order, all of them if scope is
+    None, see data_sync.registration.get_scope()
+    """
+    registered_models = data_sync.registration.sort_dependencies()
+    if scope is None:
+        return registered_models
+    return [
+        Model
+        for Model in registered_models
+        if Model._meta.label_lower in scope
+    ]
+
+
+def get_scoped_queryset(Model, scope=None):
+    """
+    Objects of Model in scope, see data_sync.registration.get_scope()
+    """
+    queryset = Model.objects.all()
+    if scope is not None:
+        queryset = queryset.filter(**scope.get(Model._meta.label_lower, {}))
+    return queryset
 
 
 def export():
@@ -60,97 +484,1010 @@ def export():
     """
     data = []
     for Model in data_sync.registration.sort_dependencies():
-        objects = Model.objects.all()
+        header = data_sync.columns.get_header(Model)
+        objects = [
+            {'model': header['model'], 'fields': dict(zip(header['columns'], values))}  # noqa
+            for chunk in data_sync.columns.iter_values(
+                Model.objects.all(), settings.DATA_SYNC_EXPORT_CHUNK_SIZE
+            )
+            for _, values in chunk
+        ]
         if not objects:
             continue
 
-        serialized_objects = serializers.serialize(
-            'json',
-            objects,
-            use_natural_foreign_keys=True,
-            use_natural_primary_keys=True,
-            fields=Model._data_sync_fields + Model._data_sync_file_fields
-        )
-        data.append(serialized_objects)
+        # same as Django JSON serializer output
+        data.append(json.dumps(objects, cls=DjangoJSONEncoder))
     return data
 
 
-def django_sync(pulled_data):
+def _dumps_line(data):
+    return json.dumps(data, cls=DjangoJSONEncoder) + '\n'
+
+
+def export_stream(chunk_size=None, since=None, model=None, after=None,
+                  limit=None, columns=False, scope=None):
+    """
+    Streaming counterpart of export(), yields NDJSON lines, one serialized
+    object per line (same shape as Django JSON serializer objects).
+
+    Objects are read with queryset.iterator() and serialized chunk by chunk
+    so memory stays constant regardless of the size of the tables.
+
+    The first line holds export metadata: watermark, the time of the export
+    to be passed as since to the next incremental export, and incremental,
+    labels of models exported incrementally. With since, models registered
+    with updated_field only export objects changed since then, followed by
+    lines listing natural keys of their objects deleted since then.
+
+    Serialized objects get a hash of their fields, see data_sync.diffing
+
+    With model (a model label), only a page of objects of that model is
+    exported, at most limit objects (ordered by pk) whose pk is greater than
+    the cursor after, so a big export can be pulled page by page. The model
+    and the cursor of the next page (None on the last page) are added to the
+    metadata line, so the next page can be requested before this one is
+    downloaded. Deleted natural keys come with the first page. Unknown
+    models export no objects.
+
+    With columns, objects are exported in the compact columnar format, see
+    data_sync.columns
+
+    With scope (checked with data_sync.registration.check_scope()), only its
+    models and their objects matching its filters are exported. Objects
+    deleted since since are all listed, filters can't apply to them.
+
+    Export metrics are reported to DATA_SYNC_METRICS_HOOKS once the export
+    is streamed, see data_sync.metrics
+    """
+    if chunk_size is None:
+        chunk_size = settings.DATA_SYNC_EXPORT_CHUNK_SIZE
+
+    registered_models = get_scoped_models(scope)
+    if model is not None:
+        registered_models = [
+            Model
+            for Model in registered_models
+            if Model._meta.label_lower == model
+        ]
+    incremental_models = [
+        Model
+        for Model in registered_models
+        if since is not None and Model._data_sync_updated_field
+    ]
+    export_info = {
+        'watermark': timezone.now(),
+        'incremental': [Model._meta.label_lower for Model in incremental_models]  # noqa
+    }
+
+    querysets = []
+    for Model in registered_models:
+        queryset = get_scoped_queryset(Model, scope)
+        if Model in incremental_models:
+            queryset = queryset.filter(**{
+                f'{Model._data_sync_updated_field}__gte': since
+            })
+        querysets.append(queryset)
+
+    if model is not None:
+        export_info['model'] = model
+        export_info['cursor'] = None
+        if querysets:
+            querysets[0], export_info['cursor'] = _get_page(
+                querysets[0], after, limit
+            )
+    yield _dumps_line(export_info)
+
+    metrics = data_sync.metrics.SyncMetrics()
+    for queryset in querysets:
+        Model = queryset.model
+        label = Model._meta.label_lower
+        with metrics.measure('export', label, using=queryset.db):
+            if columns:
+                yield _dumps_line(data_sync.columns.get_header(Model))
+                for rows in data_sync.columns.iter_rows(queryset, chunk_size):
+                    metrics.add('export', label, objects=len(rows))
+                    yield ''.join(_dumps_line(row) for row in rows)
+            else:
+                yield from _export_serialized_objects(
+                    queryset, chunk_size, metrics
+                )
+
+            if Model in incremental_models and after is None:
+                yield from _export_deleted_natural_keys(
+                    Model, since, chunk_size
+                )
+    metrics.report()
+
+
+def _export_serialized_objects(queryset, chunk_size, metrics=None):
+    label = queryset.model._meta.label_lower
+    for serialized_objects in data_sync.columns.iter_serialized_objects(
+        queryset, chunk_size
+    ):
+        if metrics is not None:
+            metrics.add('export', label, objects=len(serialized_objects))
+        yield ''.join(
+            _dumps_line(serialized_object)
+            for serialized_object in serialized_objects
+        )
+
+
+def _get_page(queryset, after, limit):
+    """
+    :return: tuple of queryset of at most limit objects whose pk is greater
+        than after, and pk of the last one (None if it's the last page)
+    """
+    queryset = queryset.order_by('pk')
+    if after is not None:
+        queryset = queryset.filter(
+            pk__gt=queryset.model._meta.pk.to_python(after)
+        )
+    if limit is None:
+        return queryset, None
+
+    # bounding the page by pk instead of slicing it, so the cursor is
+    # known before any object is exported
+    cursor = next(
+        iter(queryset.values_list('pk', flat=True)[limit - 1:limit]), None
+    )
+    if cursor is not None:
+        queryset = queryset.filter(pk__lte=cursor)
+    return queryset, cursor
+
+
+def _export_deleted_natural_keys(Model, since, chunk_size):
+    from data_sync.models import Tombstone
+
+    natural_keys = Tombstone.objects.filter(
+        model=Model._meta.label_lower,
+        time_deleted__gte=since
+    ).values_list('natural_key', flat=True).iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = list(islice(natural_keys, chunk_size))
+        if not chunk:
+            break
+        yield _dumps_line({
+            'model': Model._meta.label_lower,
+            'deleted': [json.loads(natural_key) for natural_key in chunk]
+        })
+
+
+def _warm_own_natural_key_cache(Model, serialized_objects):
+    """
+    Django deserializer looks up every object by its natural key to know if
+    it already exists, resolve them all at once
+    """
+    try:
+        natural_keys = [
+            data_sync.bulk.get_serialized_natural_key(
+                Model, serialized_object['fields']
+            )
+            for serialized_object in serialized_objects
+        ]
+    except data_sync.bulk.NATURAL_KEY_ERRORS:
+        return
+    Model.objects.warm_natural_key_cache(natural_keys)
+
+
+def django_sync(pulled_data, batch_size=None, bulk=None,
+                skip_unchanged=None, on_model_synced=None, scope=None,
+                metrics=None):
     """
     They heavy lifting, thanks to Django magic.
     Since we need to also delete things, when locale is given, do not
     delete translations in other locales.
+
+    pulled_data can be a lazy iterator, objects are deserialized and saved
+    in batches of batch_size so the whole data is never held in memory.
+
+    When bulk is True (defaults to DATA_SYNC_BULK_APPLY), each batch is
+    written with bulk_create / bulk_update, see data_sync.bulk
+
+    When skip_unchanged is True (defaults to DATA_SYNC_SKIP_UNCHANGED),
+    pulled objects identical to the local ones are not written at all.
+
+    Models exported incrementally only get the objects listed as deleted by
+    the source env deleted, instead of every object not pulled.
+
+    on_model_synced is called with a model and pks of its pulled objects
+    once they are all saved and committed, e.g. to sync their files while
+    the next models are saved (see FilesSync). In a single transaction, it's
+    called for every model once it's committed, before returning. Within a
+    transaction opened by the caller, it's called once that one is committed.
+
+    Models registered with fast_load are synced without per row signals,
+    data_sync_completed is sent instead once committed, see data_sync.signals
+
+    With scope (see data_sync.registration.get_scope()), pulled_data only
+    holds objects in scope, so only the ones in scope are deleted.
+
+    With metrics (a SyncMetrics), per model objects inserted, updated,
+    unchanged and deleted, queries and elapsed seconds are added to it.
+
+    DATA_SYNC_TRANSACTION sets the transactions of the sync: sync runs it in
+    a single transaction (see apply_transaction()), rolled back on failure,
+    batch commits each batch on its own, and an empty value leaves every
+    query in autocommit.
+
+    :return: watermark of the export, None if not given by the source env
     """
-    processed_ids = defaultdict(list)
+    if batch_size is None:
+        batch_size = settings.DATA_SYNC_IMPORT_BATCH_SIZE
+    if bulk is None:
+        bulk = settings.DATA_SYNC_BULK_APPLY
+    if skip_unchanged is None:
+        skip_unchanged = settings.DATA_SYNC_SKIP_UNCHANGED
 
-    for serialized_objects_per_model in pulled_data:
-        for obj in serializers.deserialize('json', serialized_objects_per_model):  # noqa
-            obj.save()
-            processed_ids[obj.object.__class__].append(obj.object.id)
+    processed_ids = defaultdict(set)
+    export_info = _new_export_info()
+    changes = _new_changes()
 
-    registered_models = data_sync.registration.sort_dependencies()
-    for Model, ids in processed_ids.items():
-        Model.objects.exclude(id__in=ids).delete()
+    is_single_transaction = settings.DATA_SYNC_TRANSACTION == 'sync'
+    is_in_transaction = transaction.get_connection().in_atomic_block
+    # models whose objects are not committed yet
+    applied_models = []
 
-        # remove processed model, if there's still any
-        # then no objects present in that model in the source env
-        registered_models.remove(Model)
+    def model_applied(Model, pks):
+        if is_in_transaction:
+            transaction.on_commit(partial(on_model_synced, Model, pks))
+        elif is_single_transaction:
+            applied_models.append((Model, pks))
+        else:
+            on_model_synced(Model, pks)
 
-    if registered_models:
-        for Model in registered_models:
-            Model.objects.all().delete()
+    serialized_objects = _iter_serialized_objects(pulled_data, export_info)
+    with apply_transaction() if is_single_transaction else nullcontext():
+        with data_sync.managers.natural_key_cache():
+            apply_serialized_objects(
+                serialized_objects, processed_ids, batch_size, bulk,
+                skip_unchanged,
+                on_model_applied=model_applied if on_model_synced else None,
+                changes=changes, metrics=metrics
+            )
+
+        delete_removed_objects(
+            processed_ids, export_info, batch_size, changes=changes,
+            scope=scope, metrics=metrics
+        )
+        transaction.on_commit(partial(send_data_sync_completed, changes))
 
+    for Model, pks in applied_models:
+        on_model_synced(Model, pks)
+    return export_info['watermark']
 
-def files_sync(data_source_base_url):
+
+@contextmanager
+def apply_transaction(using='default'):
     """
-    Download all the files from source env to target env and save it
+    Transaction applying pulled data, foreign key checks are disabled or
+    deferred until the end of it, then run on synced tables only, same as
+    loaddata
     """
-    media_base_url = requests.get(
-        f'{data_source_base_url}/{url_constants.EXPORT_FILES_CONFIGURATION}',
-        headers=get_export_request_headers(),
-        timeout=10
-    ).json()['media_base_url']
-    if media_base_url == 'no_files_sync':
-        return
+    table_names = []
+    for Model in data_sync.registration.sort_dependencies():
+        table_names.append(Model._meta.db_table)
+        table_names.extend(
+            field.remote_field.through._meta.db_table
+            for field in Model._meta.local_many_to_many
+            if field.remote_field.through._meta.auto_created
+        )
+
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        with connection.constraint_checks_disabled():
+            yield
+        connection.check_constraints(table_names=table_names)
+
+
+def apply_serialized_objects(serialized_objects, processed_ids, batch_size,
+                             bulk, skip_unchanged, on_model_applied=None,
+                             changes=None, metrics=None):
+    """
+    Save serialized objects batch by batch, see django_sync()
+
+    :param processed_ids: dict of Model -> set, pks of the pulled objects
+        are added to it
+    :param on_model_applied: called with a model and pks of its pulled
+        objects once they are all saved
+    :param changes: pks of saved objects of fast loaded models are added to
+        it, see _new_changes()
+    :param metrics: SyncMetrics, apply stage counters are added to it
+    :return: number of serialized objects
+    """
+    def model_applied(Model):
+        if on_model_applied:
+            on_model_applied(Model, list(processed_ids[Model]))
+
+    is_batch_transaction = settings.DATA_SYNC_TRANSACTION == 'batch'
+    count = 0
+    Model = None
+    for batch in _iter_batches(serialized_objects, batch_size):
+        BatchModel = django_apps.get_model(batch[0]['model'])
+        if Model is not None and BatchModel is not Model:
+            model_applied(Model)
+        Model = BatchModel
+
+        count += len(batch)
+        label = Model._meta.label_lower
+        with metrics.measure('apply', label) if metrics else nullcontext():
+            with transaction.atomic() if is_batch_transaction else nullcontext():  # noqa
+                counts = _apply_batch(
+                    Model, batch, processed_ids, batch_size, bulk,
+                    skip_unchanged, changes
+                )
+        if metrics is not None:
+            metrics.add('apply', label, objects=len(batch), **counts)
+
+    if Model is not None:
+        model_applied(Model)
+    return count
+
+
+def _apply_batch(Model, batch, processed_ids, batch_size, bulk,
+                 skip_unchanged, changes=None):
+    """
+    :return: Counter of inserted, updated and unchanged objects
+    """
+    counts = Counter()
+    existing_pks = None
+    if skip_unchanged:
+        batch, unchanged_pks, existing_pks = (
+            data_sync.diffing.split_unchanged(Model, batch)
+        )
+        processed_ids[Model].update(unchanged_pks)
+        counts['unchanged'] = len(unchanged_pks)
+        if not batch:
+            return counts
+
+    data_sync.bulk.warm_natural_key_caches(Model, batch)
+
+    # bulk writes do not send signals either
+    is_fast_load = data_sync.registration.is_fast_load(Model)
+    saved_pks = (
+        changes['saved'][Model]
+        if is_fast_load and changes is not None else set()
+    )
+
+    if bulk or is_fast_load:
+        pks = data_sync.bulk.bulk_save(
+            Model, batch, batch_size, existing_pks=existing_pks,
+            counts=counts
+        )
+        if pks is not None:
+            processed_ids[Model].update(pks)
+            saved_pks.update(pks)
+            return counts
+        if is_fast_load:
+            raise ValueError(
+                f'{Model._meta.label_lower}: natural key of fast loaded '
+                f'objects can not be inferred from their synced fields'
+            )
+
+    if existing_pks:
+        Model.objects.cache_natural_keys(existing_pks)
+    _warm_own_natural_key_cache(Model, batch)
+    for obj in serializers.deserialize('python', batch):
+        # the deserializer sets the pk of existing objects
+        counts['inserted' if obj.object.pk is None else 'updated'] += 1
+        obj.save()
+        processed_ids[obj.object.__class__].add(obj.object.pk)
+    return counts
+
+
+def delete_removed_objects(processed_ids, export_info, batch_size,
+                           changes=None, scope=None, metrics=None,
+                           processed_objects=None):
+    """
+    Delete local objects not present in the source env anymore, see
+    get_removed_pks()
+
+    :param changes: natural keys of deleted objects of fast loaded models are
+        added to it, see _new_changes()
+    :param scope: only objects in scope were pulled, see
+        data_sync.registration.get_scope()
+    :param metrics: SyncMetrics, delete stage counters are added to it
+    :param processed_objects: ProcessedObject queryset, pks staged by a
+        chunked sync used instead of processed_ids
+
+    :return: dict of model label -> number of deleted objects
+    """
+    # children first, so that deleting a parent has less to cascade
+    deleted = Counter()
+    for Model in reversed(get_scoped_models(scope)):
+        label = Model._meta.label_lower
+        with metrics.measure('delete', label) if metrics else nullcontext():
+            removed_pks = get_removed_pks(
+                Model, processed_ids[Model], export_info, batch_size, scope,
+                processed_objects=processed_objects
+            )
+            deleted.update(
+                delete_pks(Model, removed_pks, batch_size, changes=changes)
+            )
+
+    for label, count in deleted.items():
+        logger.info(f'{label}: {count} objects deleted')
+        if metrics is not None:
+            metrics.add('delete', label.lower(), deleted=count)
+    return deleted
+
+
+def get_removed_pks(Model, processed_pks, export_info, chunk_size,
+                    scope=None, processed_objects=None):
+    """
+    pks of local objects of Model not present in the source env anymore,
+    without a single exclude(pk__in=...) listing every processed pk.
+
+    For models exported incrementally, those are the objects listed as
+    deleted by the source env, except the ones in processed_pks (deleted then
+    created again). For other models, those are the objects whose pk is not
+    in processed_pks, models not pulled at all have no objects in the source
+    env. With scope, only local objects in scope are considered.
+
+    With processed_objects (ProcessedObject queryset), processed pks are
+    looked up in the database instead, by an anti-join for models not
+    exported incrementally.
+    """
+    label = Model._meta.label_lower
+    if processed_objects is not None:
+        processed_objects = processed_objects.filter(model=label)
+
+    if label not in export_info['incremental']:
+        queryset = get_scoped_queryset(Model, scope)
+        if processed_objects is not None:
+            return list(
+                queryset.exclude(Exists(processed_objects.filter(
+                    object_pk=Cast(OuterRef('pk'), CharField())
+                ))).values_list('pk', flat=True).iterator(
+                    chunk_size=chunk_size
+                )
+            )
+        return [
+            pk
+            for pk in queryset.values_list('pk', flat=True).iterator(
+                chunk_size=chunk_size
+            )
+            if pk not in processed_pks
+        ]
+
+    natural_keys = export_info['deleted'][label]
+    removed_pks = []
+    for i in range(0, len(natural_keys), chunk_size):
+        pks = Model.objects.get_pks_by_natural_keys([
+            Model.objects.to_python_natural_key(natural_key)
+            for natural_key in natural_keys[i:i + chunk_size]
+        ])
+        if processed_objects is not None:
+            processed_pks = {
+                Model._meta.pk.to_python(pk)
+                for pk in processed_objects.filter(
+                    object_pk__in=[str(pk) for pk in pks.values()]
+                ).values_list('object_pk', flat=True)
+            }
+        removed_pks.extend(
+            pk for pk in pks.values() if pk not in processed_pks
+        )
+    return removed_pks
+
+
+def generate_compare_data(pulled_data, batch_size=None, scope=None):
+    """
+    Dry run of django_sync, pulled objects are compared with local objects by
+    natural key and content hash (a few queries per batch), nothing is
+    written.
+
+    :return: dict of model label -> number of added, changed, removed and
+        unchanged objects, with a sample of added, changed and removed
+        natural keys. unknown counts objects whose natural key can't be
+        inferred from the synced fields, removed is None for models with
+        unknown objects since they can't be told apart from removed ones.
+    """
+    if batch_size is None:
+        batch_size = settings.DATA_SYNC_IMPORT_BATCH_SIZE
+
+    registered_models = get_scoped_models(scope)
+    compare_data = {
+        Model._meta.label_lower: {
+            'added': 0,
+            'changed': 0,
+            'removed': 0,
+            'unchanged': 0,
+            'unknown': 0,
+            'added_natural_keys': [],
+            'changed_natural_keys': [],
+            'removed_natural_keys': []
+        }
+        for Model in registered_models
+    }
+
+    def add(model_compare_data, diff_type, natural_key):
+        model_compare_data[diff_type] += 1
+        natural_keys = model_compare_data[f'{diff_type}_natural_keys']
+        if len(natural_keys) < COMPARE_DATA_NATURAL_KEYS_SAMPLE_SIZE:
+            natural_keys.append(natural_key)
+
+    processed_ids = defaultdict(set)
+    export_info = _new_export_info()
+
+    serialized_objects = _iter_serialized_objects(pulled_data, export_info)
+    for batch in _iter_batches(serialized_objects, batch_size):
+        Model = django_apps.get_model(batch[0]['model'])
+        model_compare_data = compare_data[Model._meta.label_lower]
+
+        diff = data_sync.diffing.diff_batch(Model, batch)
+        if diff is None:
+            model_compare_data['unknown'] += len(batch)
+            continue
+
+        for _, natural_key, pk, is_identical in diff:
+            if pk is None:
+                add(model_compare_data, 'added', natural_key)
+                continue
+
+            processed_ids[Model].add(pk)
+            if is_identical:
+                model_compare_data['unchanged'] += 1
+            else:
+                add(model_compare_data, 'changed', natural_key)
+
+    for Model in registered_models:
+        model_compare_data = compare_data[Model._meta.label_lower]
+        if model_compare_data['unknown']:
+            model_compare_data['removed'] = None
+            continue
+
+        removed_pks = get_removed_pks(
+            Model, processed_ids[Model], export_info, batch_size, scope
+        )
+        model_compare_data['removed'] = len(removed_pks)
+        model_compare_data['removed_natural_keys'] = [
+            list(natural_key)
+            for natural_key in Model.objects.filter(
+                pk__in=removed_pks[:COMPARE_DATA_NATURAL_KEYS_SAMPLE_SIZE]
+            ).values_list(*Model.objects._get_natural_key_lookups())
+        ]
+
+    return compare_data
+
+
+class _FastLoadCollector(Collector):
+    # fast loaded models are deleted without signals, see data_sync.signals
+    def _has_signal_listeners(self, model):
+        return False
+
+
+def delete_pks(Model, doomed_pks, chunk_size, changes=None):
+    """
+    Delete objects of Model in chunks
+
+    :param changes: natural keys of deleted objects are added to it if Model
+        is fast loaded, see _new_changes()
+    :return: dict of model label -> number of deleted objects, cascades
+        included
+    """
+    if not doomed_pks:
+        return {}
+
+    from data_sync.models import create_tombstones
+
+    queryset = Model.objects.all()
+    connection = connections[queryset.db]
+
+    # no signals and no cascades, no need to collect objects before
+    # deleting them
+    is_fast_load = data_sync.registration.is_fast_load(Model)
+    collector_class = _FastLoadCollector if is_fast_load else Collector
+    is_fast_delete = collector_class(using=queryset.db).can_fast_delete(
+        queryset
+    )
+    chunk_size = min(
+        chunk_size, connection.ops.bulk_batch_size(['pk'], doomed_pks)
+    )
+
+    deleted = Counter()
+    for i in range(0, len(doomed_pks), chunk_size):
+        chunk_queryset = Model.objects.filter(
+            pk__in=doomed_pks[i:i + chunk_size]
+        )
+        if is_fast_load:
+            natural_keys = [
+                list(natural_key)
+                for natural_key in chunk_queryset.values_list(
+                    *Model.objects._get_natural_key_lookups()
+                )
+            ]
+            if changes is not None:
+                changes['deleted'][Model].extend(natural_keys)
+
+        if is_fast_delete:
+            # pre_delete receivers are skipped, tombstones included
+            if is_fast_load and Model._data_sync_updated_field:
+                create_tombstones(Model, natural_keys)
+            deleted[Model._meta.label] += chunk_queryset._raw_delete(
+                queryset.db
+            )
+        else:
+            deleted.update(chunk_queryset.delete()[1])
+    return deleted
+
+
+def send_data_sync_completed(changes, chunk_size=None):
+    """
+    Send data_sync_completed for every fast loaded model with changes, see
+    data_sync.signals
+    """
+    if chunk_size is None:
+        chunk_size = settings.DATA_SYNC_IMPORT_BATCH_SIZE
 
     for Model in data_sync.registration.sort_dependencies():
-        if not Model._data_sync_file_fields:
+        saved_pks = list(changes['saved'].get(Model, ()))
+        deleted_natural_keys = changes['deleted'].get(Model, [])
+        if not saved_pks and not deleted_natural_keys:
             continue
 
-        qs = Model.objects.all().only(Model._data_sync_file_fields)
+        lookups = Model.objects._get_natural_key_lookups()
+        saved_natural_keys = [
+            list(natural_key)
+            for i in range(0, len(saved_pks), chunk_size)
+            for natural_key in Model.objects.filter(
+                pk__in=saved_pks[i:i + chunk_size]
+            ).values_list(*lookups)
+        ]
+        data_sync.signals.data_sync_completed.send(
+            sender=Model,
+            saved_natural_keys=saved_natural_keys,
+            deleted_natural_keys=deleted_natural_keys
+        )
 
-        for obj in qs.iterator():
-            for file_field_name in Model._data_sync_file_fields:
-                file_field = getattr(obj, file_field_name, None)
-                if file_field is None:
+
+def _get_storage_metadata(storages_metadata, storage):
+    # keyed by id, storages are not all hashable
+    if id(storage) not in storages_metadata:
+        storages_metadata[id(storage)] = data_sync.files.StorageMetadata(
+            storage
+        )
+    return storages_metadata[id(storage)]
+
+
+def export_files_manifest():
+    """
+    Yields NDJSON lines of name, size and md5 of files of registered models
+    file fields, for the target env to only download missing or changed files
+
+    md5 is None unless the storage provides it (see StorageMetadata), file
+    content is never read.
+    """
+    storages_metadata = {}
+    for Model in data_sync.registration.sort_dependencies():
+        for file_field_name in Model._data_sync_file_fields:
+            storage = Model._meta.get_field(file_field_name).storage
+            storage_metadata = _get_storage_metadata(
+                storages_metadata, storage
+            )
+
+            names = Model.objects.exclude(
+                **{f'{file_field_name}__isnull': True}
+            ).exclude(
+                **{file_field_name: ''}
+            ).values_list(file_field_name, flat=True).distinct()
+
+            for name in names.iterator():
+                metadata = storage_metadata.get(name)
+                if metadata is None:
                     continue
+                size, md5 = metadata
+                yield _dumps_line({'name': name, 'size': size, 'md5': md5})
 
-                r = requests.get(
-                    f'{media_base_url}/{file_field.name}',
-                    timeout=10
+
+def _pull_files_manifest(session, data_source_base_url):
+    """
+    :return: dict of file name -> tuple of size and md5 of source env files,
+        None if the source env does not export files manifest
+    """
+    r = session.get(
+        f'{data_source_base_url}/{url_constants.EXPORT_FILES_MANIFEST}',
+        headers=get_export_request_headers(),
+        timeout=60,
+        stream=True
+    )
+    if not r.ok:
+        return None
+
+    manifest = {}
+    with r:
+        for line in r.iter_lines(chunk_size=IMPORT_STREAM_CHUNK_SIZE):
+            if line:
+                file_metadata = json.loads(line)
+                manifest[file_metadata['name']] = (
+                    file_metadata['size'],
+                    file_metadata['md5']
                 )
-                if not r.ok:
+    return manifest
+
+
+class FilesSync:
+    """
+    Sync files of objects of registered models, model by model, in a
+    background thread, see files_sync()
+
+    Use as a context manager, exiting it waits for every added model, e.g.
+
+        with FilesSync(data_source_base_url) as files:
+            django_sync(pulled_data, on_model_synced=files.add)
+
+    so files of a model are downloaded while the next models are saved, or
+    once they are all committed with DATA_SYNC_TRANSACTION 'sync'.
+    """
+
+    def __init__(self, data_source_base_url, concurrency=None, scope=None,
+                 metrics=None):
+        if concurrency is None:
+            concurrency = settings.DATA_SYNC_FILES_SYNC_CONCURRENCY
+
+        self.data_source_base_url = data_source_base_url
+        self.concurrency = concurrency
+        # objects in scope only, see data_sync.registration.get_scope()
+        self.scope = scope
+        # SyncMetrics the stats are added to
+        self.metrics = metrics
+        # None if the source env does not sync files
+        self.stats = None
+
+    def __enter__(self):
+        self.session = data_sync.files.get_session(self.concurrency)
+        self.files_configuration = self.session.get(
+            f'{self.data_source_base_url}/{url_constants.EXPORT_FILES_CONFIGURATION}',  # noqa
+            headers=get_export_request_headers(),
+            timeout=10
+        ).json()
+        self.media_base_url = self.files_configuration['media_base_url']
+        if self.media_base_url == 'no_files_sync':
+            self.session.close()
+            self.session = None
+            return self
+
+        self.manifest = _pull_files_manifest(
+            self.session, self.data_source_base_url
+        )
+        self.storages_metadata = {}
+        self.stats = Counter(synced=0, unchanged=0, failed=0, size=0)
+        self.start = time.perf_counter()
+
+        # one model at a time, its files concurrency at once
+        self.models_executor = ThreadPoolExecutor(max_workers=1)
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        self.futures = []
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.session is None:
+            return
+
+        self.models_executor.shutdown(wait=True)
+        self.executor.shutdown(wait=True)
+        self.session.close()
+        for future in self.futures:
+            if future.exception() is not None:
+                logger.warning(future.exception(), exc_info=True)
+
+        elapsed = time.perf_counter() - self.start
+        logger.info(
+            f'{self.stats["synced"]} files synced '
+            f'({self.stats["size"]} bytes, '
+            f'{self.stats["size"] / elapsed / 1024:.0f} KiB/s), '
+            f'{self.stats["unchanged"]} unchanged, '
+            f'{self.stats["failed"]} failed, in {elapsed:.2f}s'
+        )
+        self.stats = dict(self.stats, elapsed=elapsed)
+        if self.metrics is not None:
+            self.metrics.add(
+                'files',
+                synced=self.stats['synced'],
+                unchanged=self.stats['unchanged'],
+                failed=self.stats['failed'],
+                bytes=self.stats['size'],
+                elapsed=elapsed
+            )
+
+    def add(self, Model, pks=None):
+        """
+        Sync files of objects of Model in the background
+
+        :param pks: pks of the objects, defaults to all the objects in scope
+        """
+        if self.session is None or not Model._data_sync_file_fields:
+            return
+        if pks is not None:
+            pks = list(pks)
+        self.futures.append(
+            self.models_executor.submit(self._sync_model, Model, pks)
+        )
+
+    def _iter_chunks(self, Model, pks):
+        chunk_size = settings.DATA_SYNC_IMPORT_BATCH_SIZE
+        queryset = get_scoped_queryset(Model, self.scope).only(
+            *Model._data_sync_file_fields
+        )
+        if pks is not None:
+            for i in range(0, len(pks), chunk_size):
+                yield list(queryset.filter(pk__in=pks[i:i + chunk_size]))
+            return
+
+        objects = queryset.iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(islice(objects, chunk_size))
+            if not chunk:
+                break
+            yield chunk
+
+    def _sync_model(self, Model, pks):
+        try:
+            for chunk in self._iter_chunks(Model, pks):
+                self._sync_chunk(Model, chunk)
+        finally:
+            # connections are per thread
+            connections.close_all()
+
+    def _sync_chunk(self, Model, chunk):
+        futures = []
+        for obj in chunk:
+            for file_field_name in Model._data_sync_file_fields:
+                field_file = getattr(obj, file_field_name, None)
+                if not field_file:
                     continue
 
-                bytes_content = BytesIO(r.content)
+                source_metadata = storage_metadata = None
+                if self.manifest is not None:
+                    source_metadata = self.manifest.get(field_file.name)
+                    if source_metadata is None:
+                        # not in the source env storage
+                        self.stats['failed'] += 1
+                        continue
+                    storage_metadata = _get_storage_metadata(
+                        self.storages_metadata, field_file.storage
+                    )
 
-                new_file = File(bytes_content)
-                file_field.save(file_field.name, new_file, save=True)
-                new_file.close()
+                future = self.executor.submit(
+                    data_sync.files.sync_file,
+                    self.session,
+                    self.media_base_url,
+                    field_file,
+                    source_metadata=source_metadata,
+                    storage_metadata=storage_metadata,
+                    source_google_cloud_storage=self.files_configuration.get('google_cloud_storage'),  # noqa
+                    spool_max_size=settings.DATA_SYNC_FILES_SYNC_SPOOL_MAX_SIZE  # noqa
+                )
+                futures.append(future)
+
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.warning(e, exc_info=True)
+                self.stats['failed'] += 1
+                continue
+
+            if result['is_unchanged']:
+                self.stats['unchanged'] += 1
+                continue
+            if not result['is_synced']:
+                self.stats['failed'] += 1
+                continue
 
+            self.stats['synced'] += 1
+            self.stats['size'] += result['size']
 
-def run(data_source_base_url, is_generate_compare_data=False):
+
+def files_sync(data_source_base_url, concurrency=None, scope=None,
+               metrics=None):
+    """
+    Download all the files from source env to target env and save it.
+
+    concurrency (defaults to DATA_SYNC_FILES_SYNC_CONCURRENCY) files are
+    downloaded at once over a shared pooled HTTP session.
+
+    Files with the same size and md5 (size only if an env does not know it)
+    in both env (according to the source env manifest, see
+    export_files_manifest()) are not downloaded.
+
+    Downloads are streamed, see data_sync.files.sync_file()
+
+    With scope, only files of objects in scope are synced, see
+    data_sync.registration.get_scope()
+
+    :return: dict of number of files synced, unchanged and failed, total
+        bytes and elapsed seconds
+    """
+    with FilesSync(data_source_base_url, concurrency, scope, metrics) as files:
+        for Model in get_scoped_models(scope):
+            files.add(Model)
+    return files.stats
+
+
+def _files_sync_on_commit(data_source_base_url, scope, metrics, data_pull):
+    """
+    Files sync of run() within a caller's transaction, once it's committed,
+    metrics are reported and saved on data_pull afterwards
+    """
+    files_sync(data_source_base_url, scope=scope, metrics=metrics)
+    metrics.report()
+    if data_pull is not None:
+        data_pull.metrics = metrics.to_json()
+        # update() instead of save(), only metrics changed since it was saved
+        type(data_pull).objects.filter(id=data_pull.id).update(
+            metrics=data_pull.metrics
+        )
+
+
+def run(data_source_base_url, is_generate_compare_data=False,
+        data_pull=None):
     """
     Run the data sync process, returns compare data to be saved to DataPull
     for audit/history purposes
+
+    When is_generate_compare_data is True, it's a dry run, nothing is
+    written, see generate_compare_data()
+
+    :param data_pull: DataPull being run, incremental pulls start from its
+        since, partial pulls only sync its scope, its watermark, compare
+        data and metrics are set (but not saved). Within a caller's
+        transaction, files are synced once it's committed, then metrics are
+        saved again with the files stage.
     """
-    pulled_data = pull_data(data_source_base_url)
+    since = scope = None
+    if data_pull is not None:
+        since = data_pull.get_since()
+        scope = data_pull.get_scope()
+
+    metrics = data_sync.metrics.SyncMetrics()
+    is_files_sync_deferred = False
+    try:
+        pulled_data = pull_data_paged(
+            data_source_base_url, since=since, scope=scope, metrics=metrics
+        )
+    except PagedExportNotSupported:
+        pulled_data = pull_data(
+            data_source_base_url, since=since, scope=scope, metrics=metrics
+        )
 
     if is_generate_compare_data:
-        raise NotImplementedError
+        with metrics.measure('compare'):
+            compare_data = generate_compare_data(pulled_data, scope=scope)
+        # nothing synced, next incremental pull must not start from here
+        watermark = None
+    elif transaction.get_connection().in_atomic_block:
+        # objects are committed along with the caller's transaction, other
+        # threads can't read them before
+        watermark = django_sync(pulled_data, scope=scope, metrics=metrics)
+        transaction.on_commit(partial(
+            _files_sync_on_commit, data_source_base_url, scope, metrics,
+            data_pull
+        ))
+        is_files_sync_deferred = True
+        compare_data = None
     else:
-        django_sync(pulled_data)
-        files_sync(data_source_base_url)
+        # files of a model are synced while the next models are saved
+        with FilesSync(
+            data_source_base_url, scope=scope, metrics=metrics
+        ) as files:
+            watermark = django_sync(
+                pulled_data, on_model_synced=files.add, scope=scope,
+                metrics=metrics
+            )
         compare_data = None
 
+    if scope is not None:
+        # other models are not synced up to the watermark, next incremental
+        # pull must not start from here
+        watermark = None
+
+    if not is_files_sync_deferred:
+        metrics.report()
+    if data_pull is not None:
+        data_pull.metrics = metrics.to_json()
+        data_pull.watermark = watermark
+        data_pull.compare_data = json.dumps(
+            compare_data, cls=DjangoJSONEncoder, indent=2
+        ) if compare_data is not None else None
+
     return compare_data
@@ -24,6 +24,8 @@ class DataPullAdmin(TimeStampedModelAdminMixin, admin.ModelAdmin):
     list_display = (
         'time_created',
         'data_source',
+        'is_incremental',
+        'is_dry_run',
         'status'
     )
 
@@ -35,6 +37,16 @@ class DataPullAdmin(TimeStampedModelAdminMixin, admin.ModelAdmin):
 
     def get_readonly_fields(self, request, obj=None):
         if obj:
-            return 'data_source', 'status'
+            return (
+                'data_source',
+                'is_incremental',
+                'is_dry_run',
+                'synced_models',
+                'filters',
+                'status',
+                'watermark',
+                'compare_data',
+                'metrics'
+            )
         else:
-            return 'status',
+            return 'status', 'compare_data', 'metrics'
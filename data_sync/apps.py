@@ -13,6 +13,18 @@ class DataSyncConfig(AppConfig):
 
     def ready(self):
         from django.conf import settings
+        from django.db.models.signals import pre_delete
+
+        from data_sync.models import create_tombstone
+        from data_sync.registration import get_registered_models
+
+        for model in get_registered_models():
+            if model._data_sync_updated_field:
+                pre_delete.connect(
+                    create_tombstone,
+                    sender=model,
+                    dispatch_uid=f'data_sync_tombstone_{model._meta.label}'
+                )
 
         settings = settings._wrapped.__dict__
 
@@ -22,9 +34,76 @@ class DataSyncConfig(AppConfig):
         # tasks
         settings.setdefault('DATA_SYNC_FORCE_SYNC', False)
 
+        # dotted path of the class running Data Pulls, see data_sync.backends
+        # empty means Cloud Tasks on GAE (unless DATA_SYNC_FORCE_SYNC) and
+        # synchronous elsewhere
+        settings.setdefault('DATA_SYNC_BACKEND', '')
+
+        # number of Data Pulls run at once by ThreadPoolBackend
+        settings.setdefault('DATA_SYNC_THREAD_POOL_SIZE', 1)
+
+        # seconds data_sync_worker waits when there is no queued Data Pull
+        settings.setdefault('DATA_SYNC_WORKER_POLL_INTERVAL', 5)
+
+        # number of objects of a model pulled per page, background Data
+        # Pulls apply a page per work unit, see data_sync.chunks
+        settings.setdefault('DATA_SYNC_PAGE_SIZE', 10000)
+
+        # number of export pages downloaded at once
+        settings.setdefault('DATA_SYNC_PULL_CONCURRENCY', 4)
+
+        # export pages downloaded ahead and not saved yet
+        settings.setdefault('DATA_SYNC_PULL_PAGES_AHEAD', 8)
+
+        # pull the export in the compact columnar format, see data_sync.columns
+        settings.setdefault('DATA_SYNC_PULL_COLUMNS', True)
+
+        # seconds to wait for the source env to send export bytes
+        settings.setdefault('DATA_SYNC_PULL_TIMEOUT', 60)
+
+        # seconds after which a task stops starting new units and enqueues
+        # the rest of the Data Pull as another task
+        settings.setdefault('DATA_SYNC_TASK_TIME_LIMIT', 300)
+
+        # failed Data Pulls are resumed up to this many times in a row
+        settings.setdefault('DATA_SYNC_TASK_MAX_RETRIES', 3)
+
         settings.setdefault('DATA_SYNC_EXPORT_TOKEN', '')
 
-        settings.setdefault('DATA_SYNC_MEDIA_FILES_BASE_URL' '')
+        settings.setdefault('DATA_SYNC_MEDIA_FILES_BASE_URL', '')
+
+        # number of files downloaded at once by files_sync
+        settings.setdefault('DATA_SYNC_FILES_SYNC_CONCURRENCY', 8)
+
+        # downloaded files bigger than this (bytes) are buffered on disk
+        # instead of in memory
+        settings.setdefault('DATA_SYNC_FILES_SYNC_SPOOL_MAX_SIZE', 10 * 1024 * 1024)  # nopep8
+
+        # number of rows fetched and serialized at once by streaming export
+        settings.setdefault('DATA_SYNC_EXPORT_CHUNK_SIZE', 2000)
+
+        # number of pulled objects deserialized and saved at once
+        settings.setdefault('DATA_SYNC_IMPORT_BATCH_SIZE', 1000)
+
+        # write each batch with bulk_create / bulk_update instead of
+        # saving objects one by one, model save() and signals are skipped
+        settings.setdefault('DATA_SYNC_BULK_APPLY', False)
+
+        # dotted paths of callables called with the name and value of every
+        # metric of a sync or an export, see data_sync.metrics
+        settings.setdefault('DATA_SYNC_METRICS_HOOKS', [])
+
+        # sync registered models without per row signals, see
+        # data_sync.signals, register_model(fast_load=...) overrides it
+        settings.setdefault('DATA_SYNC_FAST_LOAD', False)
+
+        # transactions of a sync: 'sync' single transaction rolled back on
+        # failure, 'batch' one transaction per batch, '' autocommit
+        settings.setdefault('DATA_SYNC_TRANSACTION', 'sync')
+
+        # compare content hashes of pulled and local objects, identical
+        # objects are not written
+        settings.setdefault('DATA_SYNC_SKIP_UNCHANGED', True)
 
         # GAE specifics
         settings.setdefault('DATA_SYNC_CLOUD_TASKS_QUEUE_ID', 'data-sync')
@@ -0,0 +1,162 @@
+"""
+Backends running Data Pulls, picked with DATA_SYNC_BACKEND.
+
+A backend is handed a Data Pull once it's saved as IN_PROGRESS, it either
+runs it straight away or arranges for it to be run later, see run_data_pull.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+import data_sync
+from data_sync import GrabExportError, chunks, gcp, runtime_utils
+
+
+logger = logging.getLogger('django.data_sync')
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def run_data_pull(data_pull, data_source_base_url=None):
+    """
+    Run the next work units of data_pull (dry runs in one go), see
+    data_sync.chunks, then save it as SUCCEED or enqueue it again for the
+    remaining units.
+
+    On error it's enqueued again to resume from the last completed unit, up
+    to DATA_SYNC_TASK_MAX_RETRIES times in a row, then saved as FAILED.
+
+    :param data_source_base_url: defaults to the data pull data source URL
+    :return: status of data_pull
+    """
+    data_source_base_url = (
+        data_source_base_url or data_pull.data_source.env_url
+    )
+    try:
+        if data_pull.is_dry_run:
+            data_sync.run(
+                data_source_base_url,
+                is_generate_compare_data=True,
+                data_pull=data_pull
+            )
+            is_done = True
+        else:
+            is_done = chunks.run_chunks(data_pull, data_source_base_url)
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        if data_pull.is_dry_run or not chunks.retry(data_pull):
+            data_pull.status = 'FAILED'
+            data_pull.save()
+            return data_pull.status
+        is_done = False
+
+    if is_done:
+        data_pull.status = 'SUCCEED'
+        data_pull.save()
+    else:
+        get_backend().enqueue(data_pull)
+    return data_pull.status
+
+
+class BaseBackend:
+    def enqueue(self, data_pull):
+        """
+        Run data_pull, now or later
+        """
+        raise NotImplementedError
+
+
+class SyncBackend(BaseBackend):
+    """
+    Run within the request creating the Data Pull, blocking it until done
+    """
+    def enqueue(self, data_pull):
+        try:
+            data_sync.run(
+                data_pull.data_source.env_url,
+                is_generate_compare_data=data_pull.is_dry_run,
+                data_pull=data_pull
+            )
+        except GrabExportError:
+            raise ValidationError(
+                'Failed to get data from source. Most likely you have '
+                'invalid Data Source URL. Please refer to docs'
+            )
+        data_pull.status = 'SUCCEED'
+        data_pull.save()
+
+
+class CloudTasksBackend(BaseBackend):
+    """
+    Run by GAE Cloud Tasks calling back this env, see RunDataSyncGAECloudTasks
+    """
+    def enqueue(self, data_pull):
+        gcp.task_queues.create_run_data_sync_task(
+            data_pull_id=data_pull.id,
+            data_source_base_url=data_pull.data_source.env_url
+        )
+
+
+class ThreadPoolBackend(BaseBackend):
+    """
+    Run in a thread pool of the current process once the Data Pull is
+    committed, Data Pulls in flight are lost if the process stops
+    """
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.DATA_SYNC_THREAD_POOL_SIZE,
+            thread_name_prefix='data_sync'
+        )
+
+    def enqueue(self, data_pull):
+        transaction.on_commit(
+            lambda: self.executor.submit(self._run, data_pull)
+        )
+
+    def _run(self, data_pull):
+        try:
+            data_pull.refresh_from_db()
+            run_data_pull(data_pull)
+        except Exception as e:
+            logger.error(e, exc_info=True)
+        finally:
+            # connections are per thread, do not leak the pool thread one
+            connection.close()
+
+
+class DatabaseBackend(BaseBackend):
+    """
+    Leave the Data Pull QUEUED in the database, to be run by
+    `manage.py data_sync_worker`
+    """
+    def enqueue(self, data_pull):
+        type(data_pull).objects.filter(id=data_pull.id).update(
+            status='QUEUED'
+        )
+        data_pull.status = 'QUEUED'
+
+
+def get_backend_path():
+    if settings.DATA_SYNC_BACKEND:
+        return settings.DATA_SYNC_BACKEND
+    if runtime_utils.is_in_gae() and not settings.DATA_SYNC_FORCE_SYNC:
+        return 'data_sync.backends.CloudTasksBackend'
+    return 'data_sync.backends.SyncBackend'
+
+
+def get_backend():
+    """
+    Get the process wide backend, creating it on first call
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(get_backend_path())()
+    return _backend
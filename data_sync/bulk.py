@@ -0,0 +1,260 @@
+"""
+Bulk apply engine for django_sync.
+
+Instead of one save() (and one natural key lookup) per deserialized object,
+a batch of serialized objects of the same model is matched against existing
+rows with a single query and written with bulk_create / bulk_update.
+
+Keep in mind bulk_create / bulk_update do not call Model.save() and do not
+send pre_save / post_save signals.
+"""
+from django.core.serializers import base
+
+from data_sync.managers import DataSyncEnhancedManager, get_field_by_path
+
+
+# raised when a natural key can not be inferred from the serialized fields,
+# e.g. a natural key field is not part of the exported fields
+NATURAL_KEY_ERRORS = (KeyError, ValueError, AttributeError, TypeError)
+
+
+def _get_serialized_natural_key_value(Model, fields, path):
+    name, _, related_path = path.partition('.')
+    field = Model._meta.get_field(name)
+    value = fields[name]
+
+    if not related_path:
+        return field.to_python(value)
+
+    if value is None:
+        return None
+
+    # natural foreign key, the related object natural key is in the payload
+    RelatedModel = field.remote_field.model
+    related_natural_key = dict(
+        zip(RelatedModel._data_sync_natural_key, value)
+    )
+    return get_field_by_path(RelatedModel, related_path).to_python(
+        related_natural_key[related_path]
+    )
+
+
+def get_serialized_natural_key(Model, fields):
+    """
+    Infer the natural key of a serialized object without hitting the
+    database. Raises one of NATURAL_KEY_ERRORS if it is not possible.
+    """
+    return tuple(
+        _get_serialized_natural_key_value(Model, fields, path)
+        for path in Model._data_sync_natural_key
+    )
+
+
+def warm_natural_key_caches(Model, serialized_objects):
+    """
+    Resolve all natural foreign keys of serialized_objects with one query
+    per related model, see data_sync.managers.natural_key_cache
+    """
+    natural_keys = {}
+    for serialized_object in serialized_objects:
+        for field_name, field_value in serialized_object['fields'].items():
+            field = Model._meta.get_field(field_name)
+            if not field.is_relation or field_value is None:
+                continue
+
+            RelatedModel = field.remote_field.model
+            if not isinstance(RelatedModel._default_manager, DataSyncEnhancedManager):  # noqa
+                continue
+
+            values = field_value if field.many_to_many else [field_value]
+            natural_keys.setdefault(RelatedModel, set()).update(
+                tuple(value)
+                for value in values
+                if isinstance(value, (list, tuple))
+            )
+
+    for RelatedModel, related_natural_keys in natural_keys.items():
+        RelatedModel._default_manager.warm_natural_key_cache(
+            related_natural_keys
+        )
+
+
+def build_object(Model, fields, using):
+    """
+    Same as Django python Deserializer, minus the natural primary key lookup
+    """
+    data = {}
+    m2m_data = {}
+    for field_name, field_value in fields.items():
+        field = Model._meta.get_field(field_name)
+
+        if field.many_to_many:
+            m2m_data[field] = base.deserialize_m2m_values(
+                field, field_value, using, False
+            )
+        elif field.is_relation:
+            data[field.attname] = base.deserialize_fk_value(
+                field, field_value, using, False
+            )
+        else:
+            data[field.name] = field.to_python(field_value)
+
+    return Model(**data), m2m_data
+
+
+def _set_m2m(m2m_data_per_object):
+    """
+    Replace m2m relations of many objects at once,
+    only auto created through models are exported by Django serializer
+    """
+    through_objects = {}
+    pks = {}
+    for obj, m2m_data in m2m_data_per_object:
+        for field, related_pks in m2m_data.items():
+            Through = field.remote_field.through
+            source = field.m2m_field_name()
+            target = field.m2m_reverse_field_name()
+
+            pks.setdefault(field, []).append(obj.pk)
+            through_objects.setdefault(field, []).extend(
+                Through(**{
+                    f'{source}_id': obj.pk,
+                    f'{target}_id': related_pk
+                })
+                for related_pk in related_pks
+            )
+
+    for field, field_pks in pks.items():
+        Through = field.remote_field.through
+        Through.objects.filter(
+            **{f'{field.m2m_field_name()}__in': field_pks}
+        ).delete()
+        Through.objects.bulk_create(through_objects[field])
+
+
+def can_bulk_save(Model):
+    """
+    bulk_create() does not support multi-table inherited models
+    """
+    return all(
+        parent._meta.concrete_model is Model._meta.concrete_model
+        for parent in Model._meta.get_parent_list()
+    )
+
+
+def get_auto_now_fields(Model):
+    return [
+        field
+        for field in Model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+
+
+def bulk_save(Model, serialized_objects, batch_size=None, using='default',
+              existing_pks=None, counts=None):
+    """
+    Insert or update a batch of serialized objects of Model
+
+    :param existing_pks: dict of natural key -> pk of existing objects, if
+        already known
+    :param counts: Counter, numbers of inserted and updated objects are
+        added to it
+    :return: list of pks of the saved objects, or None if the batch can not be
+        applied in bulk, in which case nothing has been written
+    """
+    if not can_bulk_save(Model):
+        return None
+
+    try:
+        natural_keys = [
+            get_serialized_natural_key(Model, serialized_object['fields'])
+            for serialized_object in serialized_objects
+        ]
+    except NATURAL_KEY_ERRORS:
+        return None
+
+    if existing_pks is None:
+        existing_pks = Model.objects.get_pks_by_natural_keys(natural_keys)
+
+    objects_to_create = []
+    objects_to_update = []
+    update_fields = set()
+    m2m_data_per_object = []
+    for serialized_object, natural_key in zip(serialized_objects, natural_keys):  # noqa
+        obj, m2m_data = build_object(
+            Model, serialized_object['fields'], using
+        )
+        obj.pk = existing_pks.get(natural_key)
+        if obj.pk is None:
+            objects_to_create.append((natural_key, obj))
+        else:
+            objects_to_update.append(obj)
+            update_fields.update(
+                field_name
+                for field_name in serialized_object['fields']
+                if not Model._meta.get_field(field_name).many_to_many
+            )
+        if m2m_data:
+            m2m_data_per_object.append((obj, m2m_data))
+
+    if objects_to_create:
+        # bulk_create() sets auto_now / auto_now_add fields to the current
+        # time, unlike the raw save of a deserialized object
+        auto_now_fields = [
+            field
+            for field in get_auto_now_fields(Model)
+            if any(
+                field.name in serialized_object['fields']
+                for serialized_object in serialized_objects
+            )
+        ]
+        auto_now_values = [
+            (obj, {
+                field.attname: getattr(obj, field.attname)
+                for field in auto_now_fields
+            })
+            for _, obj in objects_to_create
+        ]
+        Model.objects.bulk_create(
+            [obj for _, obj in objects_to_create],
+            batch_size=batch_size
+        )
+        # some backends (e.g. MySQL) do not set pk on bulk created objects
+        if any(obj.pk is None for _, obj in objects_to_create):
+            created_pks = Model.objects.get_pks_by_natural_keys(
+                [natural_key for natural_key, _ in objects_to_create]
+            )
+            for natural_key, obj in objects_to_create:
+                obj.pk = created_pks.get(natural_key)
+        if auto_now_fields:
+            for obj, values in auto_now_values:
+                for attname, value in values.items():
+                    if value is not None:
+                        setattr(obj, attname, value)
+            Model.objects.bulk_update(
+                [obj for _, obj in objects_to_create],
+                fields=[field.name for field in auto_now_fields],
+                batch_size=batch_size
+            )
+        Model.objects.cache_natural_keys({
+            natural_key: obj.pk for natural_key, obj in objects_to_create
+        })
+
+    if objects_to_update and update_fields:
+        Model.objects.bulk_update(
+            objects_to_update,
+            fields=update_fields,
+            batch_size=batch_size
+        )
+
+    if m2m_data_per_object:
+        _set_m2m(m2m_data_per_object)
+
+    if counts is not None:
+        counts.update(
+            inserted=len(objects_to_create), updated=len(objects_to_update)
+        )
+    return [obj.pk for _, obj in objects_to_create] + [
+        obj.pk for obj in objects_to_update
+    ]
@@ -0,0 +1,288 @@
+"""
+Resumable sync, split into work units run one after the other, possibly by
+different tasks.
+
+Registered models are pulled page by page (see export_stream()), then
+objects removed from the source env are deleted and files are synced.
+Progress is checkpointed on DataPull.checkpoint after every unit, so a sync
+stopped by an error or a task time limit resumes from the last completed
+unit instead of from scratch. pks of pulled objects are staged in the
+ProcessedObject table until removed objects are deleted.
+"""
+import json
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from functools import partial
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+import data_sync
+from data_sync.exceptions import PagedExportNotSupported
+
+
+def new_checkpoint(data_pull):
+    since = data_pull.get_since()
+    scope = data_pull.get_scope()
+    return {
+        'step': 'models',
+        'since': since.isoformat() if since is not None else None,
+        # partial sync, see data_sync.registration.get_scope()
+        'scope': scope,
+        'models': [
+            Model._meta.label_lower
+            for Model in data_sync.get_scoped_models(scope)
+        ],
+        # current model and cursor of its next page
+        'index': 0,
+        'cursor': None,
+        # export metadata of the pages pulled so far, see django_sync()
+        'watermark': None,
+        'incremental': [],
+        'deleted': {},
+        # failures in a row, see retry()
+        'retries': 0
+    }
+
+
+def get_checkpoint(data_pull):
+    if data_pull.checkpoint:
+        checkpoint = json.loads(data_pull.checkpoint)
+        # checkpoints saved by previous versions list processed pks
+        for label, pks in checkpoint.pop('processed_pks', {}).items():
+            stage_processed_pks(data_pull, label, pks)
+        return checkpoint
+    return new_checkpoint(data_pull)
+
+
+def get_processed_objects(data_pull):
+    from data_sync.models import ProcessedObject
+    return ProcessedObject.objects.filter(data_pull=data_pull)
+
+
+def stage_processed_pks(data_pull, label, pks):
+    from data_sync.models import ProcessedObject
+    ProcessedObject.objects.bulk_create(
+        (
+            ProcessedObject(data_pull=data_pull, model=label, object_pk=pk)
+            for pk in map(str, pks)
+        ),
+        batch_size=settings.DATA_SYNC_IMPORT_BATCH_SIZE
+    )
+
+
+def save_checkpoint(data_pull, checkpoint, metrics=None):
+    # update() instead of save(), saving a Data Pull IN_PROGRESS enqueues it
+    data_pull.checkpoint = json.dumps(checkpoint, cls=DjangoJSONEncoder)
+    fields = {'checkpoint': data_pull.checkpoint}
+    if metrics is not None:
+        # metrics of the units run so far
+        data_pull.metrics = fields['metrics'] = metrics.to_json()
+    type(data_pull).objects.filter(id=data_pull.id).update(**fields)
+
+
+def _pull_page(data_source_base_url, checkpoint, page_size, metrics):
+    label = checkpoint['models'][checkpoint['index']]
+    since = checkpoint['since']
+    # raises PagedExportNotSupported before anything is applied
+    return data_sync.pull_data(
+        data_source_base_url,
+        since=parse_datetime(since) if since else None,
+        model=label,
+        after=checkpoint['cursor'],
+        limit=page_size,
+        scope=checkpoint.get('scope'),
+        metrics=metrics
+    )
+
+
+def _run_models_step(data_pull, data_source_base_url, checkpoint, page_size,
+                     metrics):
+    label = checkpoint['models'][checkpoint['index']]
+    pulled_data = _pull_page(
+        data_source_base_url, checkpoint, page_size, metrics
+    )
+
+    processed_ids = defaultdict(set)
+    export_info = data_sync._new_export_info()
+    changes = data_sync._new_changes()
+    serialized_objects = data_sync._iter_serialized_objects(
+        pulled_data, export_info
+    )
+    with data_sync.managers.natural_key_cache():
+        data_sync.apply_serialized_objects(
+            serialized_objects,
+            processed_ids,
+            settings.DATA_SYNC_IMPORT_BATCH_SIZE,
+            settings.DATA_SYNC_BULK_APPLY,
+            settings.DATA_SYNC_SKIP_UNCHANGED,
+            changes=changes,
+            metrics=metrics
+        )
+    transaction.on_commit(
+        partial(data_sync.send_data_sync_completed, changes)
+    )
+
+    # changes made at the source env while paging are pulled again by the
+    # next incremental sync, which starts from the earliest watermark
+    if checkpoint['watermark'] is None and export_info['watermark']:
+        checkpoint['watermark'] = export_info['watermark'].isoformat()
+    if label in export_info['incremental'] and label not in checkpoint['incremental']:  # noqa
+        checkpoint['incremental'].append(label)
+    checkpoint['deleted'].setdefault(label, []).extend(
+        export_info['deleted'][label]
+    )
+    for Model, pks in processed_ids.items():
+        stage_processed_pks(data_pull, Model._meta.label_lower, pks)
+
+    checkpoint['cursor'] = export_info['cursor']
+    if checkpoint['cursor'] is None:
+        checkpoint['index'] += 1
+
+    if checkpoint['index'] >= len(checkpoint['models']):
+        checkpoint['step'] = 'delete'
+
+
+def _run_delete_step(data_pull, checkpoint, metrics):
+    processed_objects = get_processed_objects(data_pull)
+    export_info = data_sync._new_export_info()
+    export_info['incremental'] = checkpoint['incremental']
+    export_info['deleted'].update(checkpoint['deleted'])
+
+    changes = data_sync._new_changes()
+    data_sync.delete_removed_objects(
+        defaultdict(set),
+        export_info,
+        settings.DATA_SYNC_IMPORT_BATCH_SIZE,
+        changes=changes,
+        scope=checkpoint.get('scope'),
+        metrics=metrics,
+        processed_objects=processed_objects
+    )
+    processed_objects.delete()
+    transaction.on_commit(
+        partial(data_sync.send_data_sync_completed, changes)
+    )
+    checkpoint['step'] = 'files'
+
+
+def _get_unit_transaction(step):
+    # files are synced by other threads, outside of any transaction
+    if settings.DATA_SYNC_TRANSACTION and step in ('models', 'delete'):
+        return data_sync.apply_transaction()
+    return nullcontext()
+
+
+def run_unit(data_pull, data_source_base_url, checkpoint, page_size=None,
+             metrics=None):
+    """
+    Run the next work unit of checkpoint, which is updated in place:
+    one page of a model, the deletion of removed objects or the files sync
+    (files already synced are skipped when it's run again)
+
+    :param metrics: SyncMetrics, counters of the unit are added to it
+    """
+    if page_size is None:
+        page_size = settings.DATA_SYNC_PAGE_SIZE
+
+    if checkpoint['step'] == 'models':
+        _run_models_step(
+            data_pull, data_source_base_url, checkpoint, page_size, metrics
+        )
+    elif checkpoint['step'] == 'delete':
+        _run_delete_step(data_pull, checkpoint, metrics)
+    elif checkpoint['step'] == 'files':
+        data_sync.files_sync(
+            data_source_base_url,
+            scope=checkpoint.get('scope'),
+            metrics=metrics
+        )
+        checkpoint['step'] = 'done'
+
+
+def run_chunks(data_pull, data_source_base_url, time_limit=None):
+    """
+    Run work units of data_pull from its checkpoint until the sync is done or
+    time_limit seconds (defaults to DATA_SYNC_TASK_TIME_LIMIT) are exceeded
+
+    Falls back to a one go sync when the source env does not support paged
+    export.
+
+    Metrics of the units run so far are saved on data_pull along with the
+    checkpoint, they are reported once the sync is done.
+
+    :return: True if the sync is done, in which case data_pull watermark is
+        set (but not saved)
+    """
+    if time_limit is None:
+        time_limit = settings.DATA_SYNC_TASK_TIME_LIMIT
+    deadline = time.monotonic() + time_limit
+
+    if not data_pull.checkpoint:
+        # left by a sync that failed for good
+        get_processed_objects(data_pull).delete()
+    checkpoint = get_checkpoint(data_pull)
+    metrics = data_sync.metrics.SyncMetrics.from_json(
+        data_pull.metrics if data_pull.checkpoint else None
+    )
+    while checkpoint['step'] != 'done':
+        saved_checkpoint = data_pull.checkpoint
+        saved_metrics = data_pull.metrics
+        try:
+            # a unit and its checkpoint are committed together
+            with _get_unit_transaction(checkpoint['step']):
+                run_unit(
+                    data_pull, data_source_base_url, checkpoint,
+                    metrics=metrics
+                )
+                checkpoint['retries'] = 0
+                save_checkpoint(data_pull, checkpoint, metrics)
+        except PagedExportNotSupported:
+            data_pull.checkpoint = saved_checkpoint
+            data_pull.metrics = saved_metrics
+            is_started = checkpoint['index'] or checkpoint['cursor'] is not None  # noqa
+            if checkpoint['step'] != 'models' or is_started:
+                raise
+            data_sync.run(data_source_base_url, data_pull=data_pull)
+            break
+        except BaseException:
+            # rolled back, resume from the last committed checkpoint
+            data_pull.checkpoint = saved_checkpoint
+            data_pull.metrics = saved_metrics
+            raise
+
+        if checkpoint['step'] != 'done' and time.monotonic() > deadline:
+            return False
+    else:
+        # partial syncs do not set it, see data_sync.run()
+        data_pull.watermark = (
+            parse_datetime(checkpoint['watermark'])
+            if checkpoint['watermark'] and not checkpoint.get('scope')
+            else None
+        )
+        data_pull.compare_data = None
+        metrics.report()
+
+    # nothing left to resume
+    data_pull.checkpoint = None
+    return True
+
+
+def retry(data_pull):
+    """
+    Count a failure of data_pull
+
+    :return: True if it should be run again, up to DATA_SYNC_TASK_MAX_RETRIES
+        failures in a row
+    """
+    checkpoint = get_checkpoint(data_pull)
+    if checkpoint['retries'] >= settings.DATA_SYNC_TASK_MAX_RETRIES:
+        get_processed_objects(data_pull).delete()
+        return False
+
+    checkpoint['retries'] += 1
+    save_checkpoint(data_pull, checkpoint)
+    return True
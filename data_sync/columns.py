@@ -0,0 +1,231 @@
+"""
+Export engine, serializing synced fields of registered models from
+values_list() rows.
+
+Values are the same as the ones of Django python serializer with natural
+keys, but only synced columns are selected and natural foreign keys are
+joined in the same query, instead of instantiating every object and fetching
+its related objects one by one. Models with fields that can't be read that
+way (many to many, foreign keys to models with a natural_key() not defined
+by register_model) are serialized by Django serializer, with related objects
+fetched in bulk.
+
+It also provides the compact columnar export format, see
+export_stream(columns=True): objects of a model are exported as a header
+line listing the serialized fields, followed by one line per object, an
+array of the field values and the content hash of the object, e.g.
+
+    {"model": "catalog.language", "columns": ["code", "country"]}
+    ["en", ["GB"], "5d41402abc4b2a76b9719d911017c592"]
+"""
+from itertools import islice
+from types import SimpleNamespace
+
+from django.core import serializers
+from django.db.models import Field, Prefetch
+from django.utils.encoding import is_protected_type
+
+from data_sync import diffing
+from data_sync.managers import get_natural_key_select_related
+
+
+def get_columns(Model):
+    """
+    Fields serialized by Django serializer with fields=synced fields, in the
+    same order
+    """
+    selected_fields = Model._data_sync_fields + Model._data_sync_file_fields
+    concrete_model = Model._meta.concrete_model
+    fields = [
+        field
+        for field in concrete_model._meta.local_fields
+        if field.serialize and field.name in selected_fields
+    ]
+    fields.extend(
+        field
+        for field in concrete_model._meta.local_many_to_many
+        if field.serialize and field.name in selected_fields
+        and field.remote_field.through._meta.auto_created
+    )
+    return fields
+
+
+def _get_value_reader(field, start):
+    """
+    :return: tuple of values_list() lookups of field and a function getting
+        the field serialized value from a values_list() row, starting at
+        index start, None if the field can't be read from values_list()
+    """
+    if field.many_to_many:
+        return None
+
+    if field.is_relation:
+        RelatedModel = field.remote_field.model
+        natural_key = getattr(RelatedModel, '_data_sync_natural_key', None)
+        if natural_key:
+            lookups = [field.attname] + [
+                f'{field.name}__{path.replace(".", "__")}'
+                for path in natural_key
+            ]
+            stop = start + len(lookups)
+            return lookups, lambda row: (
+                None if row[start] is None else list(row[start + 1:stop])
+            )
+        if hasattr(RelatedModel, 'natural_key'):
+            return None
+
+    is_str = type(field).value_to_string is Field.value_to_string
+
+    def read(row):
+        value = row[start]
+        if is_protected_type(value):
+            return value
+        if is_str:
+            return str(value)
+        # same as Django python serializer, without the model instance
+        return field.value_to_string(
+            SimpleNamespace(**{field.attname: value})
+        )
+
+    return [field.attname], read
+
+
+def _get_row_reader(fields, start=0):
+    """
+    :return: tuple of values_list() lookups of fields and a function getting
+        their serialized values from a values_list() row, starting at index
+        start, None if fields can't all be read from values_list()
+    """
+    lookups = []
+    readers = []
+    for field in fields:
+        value_reader = _get_value_reader(field, start + len(lookups))
+        if value_reader is None:
+            return None
+        field_lookups, read = value_reader
+        lookups.extend(field_lookups)
+        readers.append(read)
+
+    return lookups, lambda row: [read(row) for read in readers]
+
+
+def get_header(Model):
+    return {
+        'model': Model._meta.label_lower,
+        'columns': [field.name for field in get_columns(Model)]
+    }
+
+
+def _get_serializer_queryset(queryset):
+    """
+    queryset fetching related objects needed to serialize natural foreign
+    keys in bulk, along with the objects
+    """
+    Model = queryset.model
+    queryset = queryset.select_related(*get_natural_key_select_related(
+        Model, Model._data_sync_fields + Model._data_sync_file_fields
+    ))
+    for field in get_columns(Model):
+        if not field.many_to_many:
+            continue
+        RelatedModel = field.remote_field.model
+        related_lookups = {
+            '__'.join(path.split('.')[:-1])
+            for path in getattr(RelatedModel, '_data_sync_natural_key', ())
+            if '.' in path
+        }
+        queryset = queryset.prefetch_related(Prefetch(
+            field.name,
+            queryset=RelatedModel._default_manager.select_related(
+                *related_lookups
+            )
+        ))
+    return queryset
+
+
+def iter_values(queryset, chunk_size):
+    """
+    Yields lists of at most chunk_size (pk, serialized values of
+    get_columns()) tuples of objects of queryset
+    """
+    Model = queryset.model
+    fields = get_columns(Model)
+
+    row_reader = _get_row_reader(fields, start=1)
+    if row_reader is not None:
+        lookups, read = row_reader
+        values_rows = queryset.values_list('pk', *lookups).iterator(
+            chunk_size=chunk_size
+        )
+        while True:
+            chunk = list(islice(values_rows, chunk_size))
+            if not chunk:
+                break
+            yield [(row[0], read(row)) for row in chunk]
+        return
+
+    columns = [field.name for field in fields]
+    objects = _get_serializer_queryset(queryset).iterator(
+        chunk_size=chunk_size
+    )
+    while True:
+        chunk = list(islice(objects, chunk_size))
+        if not chunk:
+            break
+        serialized_objects = serializers.serialize(
+            'python',
+            chunk,
+            use_natural_foreign_keys=True,
+            use_natural_primary_keys=True,
+            fields=Model._data_sync_fields + Model._data_sync_file_fields
+        )
+        yield [
+            (obj.pk, [serialized_object['fields'][name] for name in columns])
+            for obj, serialized_object in zip(chunk, serialized_objects)
+        ]
+
+
+def iter_rows(queryset, chunk_size):
+    """
+    Yields lists of rows of at most chunk_size objects of queryset, a row
+    being serialized values of get_columns() followed by the content hash
+    """
+    columns = get_header(queryset.model)['columns']
+    for chunk in iter_values(queryset, chunk_size):
+        yield [
+            values + [diffing.get_content_hash(dict(zip(columns, values)))]
+            for _, values in chunk
+        ]
+
+
+def iter_serialized_objects(queryset, chunk_size):
+    """
+    Same as iter_rows(), but yields serialized objects (same shape as Django
+    python serializer ones, plus their content hash)
+    """
+    header = get_header(queryset.model)
+    for rows in iter_rows(queryset, chunk_size):
+        yield [to_serialized_object(header, row) for row in rows]
+
+
+def get_content_hashes(queryset, chunk_size=2000):
+    """
+    :return: dict of pk -> content hash of objects of queryset
+    """
+    columns = get_header(queryset.model)['columns']
+    return {
+        pk: diffing.get_content_hash(dict(zip(columns, values)))
+        for chunk in iter_values(queryset, chunk_size)
+        for pk, values in chunk
+    }
+
+
+def to_serialized_object(header, row):
+    """
+    Serialized object (same shape as Django python serializer ones) of a row
+    """
+    return {
+        'model': header['model'],
+        'fields': dict(zip(header['columns'], row)),
+        'hash': row[-1]
+    }
@@ -0,0 +1,158 @@
+"""
+Compression of export responses, negotiated with Accept-Encoding.
+
+gzip is always available, zstd only when zstandard is installed, on both
+sides. requests decodes gzip on the fly, zstd is decoded by iter_lines()
+when urllib3 can not.
+"""
+import zlib
+
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from urllib3.util import make_headers
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+# compressed bytes are sent once at least this many bytes are compressed,
+# instead of after every chunk, so tiny chunks (e.g. one line) still compress
+FLUSH_SIZE = 64 * 1024
+
+
+# codings urllib3 decodes on its own, depends on its version and extras
+URLLIB3_ACCEPT_ENCODING = make_headers(accept_encoding=True)['accept-encoding']
+
+
+def get_accept_encoding():
+    """
+    Accept-Encoding header value listing what this env can decode
+    """
+    if zstandard is not None and 'zstd' not in URLLIB3_ACCEPT_ENCODING:
+        return f'{URLLIB3_ACCEPT_ENCODING},zstd'
+    return URLLIB3_ACCEPT_ENCODING
+
+
+def iter_lines(response, chunk_size):
+    """
+    Same as response.iter_lines(), but also decodes zstd responses as they
+    are streamed when urllib3 does not
+    """
+    is_zstd = response.headers.get('Content-Encoding', '').strip() == 'zstd'
+    if not is_zstd or 'zstd' in URLLIB3_ACCEPT_ENCODING:
+        yield from response.iter_lines(chunk_size=chunk_size)
+        return
+
+    decompressor = zstandard.ZstdDecompressor().decompressobj()
+    pending = b''
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        pending += decompressor.decompress(chunk)
+        *lines, pending = pending.split(b'\n')
+        yield from lines
+    if pending:
+        yield pending
+
+
+def get_encoding(request):
+    """
+    :return: zstd or gzip if accepted by the client, zstd preferred, None
+        otherwise
+    """
+    accepted = set()
+    for coding in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = coding.partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+
+    if zstandard is not None and 'zstd' in accepted:
+        return 'zstd'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def _get_compressor(encoding):
+    """
+    :return: tuple of compress, flush and finish functions
+    """
+    if encoding == 'zstd':
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        return (
+            compressor.compress,
+            lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+            compressor.flush
+        )
+
+    compressor = zlib.compressobj(
+        GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+    )
+    return (
+        compressor.compress,
+        lambda: compressor.flush(zlib.Z_SYNC_FLUSH),
+        compressor.flush
+    )
+
+
+def compress_stream(chunks, encoding):
+    """
+    Compress str or bytes chunks as a stream, the first chunk (e.g. export
+    metadata) is sent straight away, the next ones about every FLUSH_SIZE
+    bytes, so the client decodes lines as they come
+    """
+    compress, flush, finish = _get_compressor(encoding)
+
+    pending_size = None
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = compress(chunk)
+
+        if pending_size is None or pending_size + len(chunk) >= FLUSH_SIZE:
+            data += flush()
+            pending_size = 0
+        else:
+            pending_size += len(chunk)
+
+        if data:
+            yield data
+
+    yield finish()
+
+
+def streaming_response(request, chunks, content_type):
+    """
+    StreamingHttpResponse of chunks, compressed if the client accepts it
+    """
+    encoding = get_encoding(request)
+    if encoding is not None:
+        chunks = compress_stream(chunks, encoding)
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    if encoding is not None:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def compress_response(request, response):
+    """
+    Compress the content of a non streaming response in place if the client
+    accepts it
+    """
+    encoding = get_encoding(request)
+    if encoding is not None:
+        compress, _, finish = _get_compressor(encoding)
+        response.content = compress(response.content) + finish()
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
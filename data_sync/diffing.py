@@ -0,0 +1,93 @@
+"""
+Content hashes of serialized objects, to tell pulled objects identical to
+the local ones apart without writing them
+"""
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from data_sync import columns
+from data_sync.bulk import NATURAL_KEY_ERRORS, get_serialized_natural_key
+
+
+def get_content_hash(fields):
+    """
+    :param fields: fields of a serialized object
+    """
+    return hashlib.md5(
+        json.dumps(fields, sort_keys=True, cls=DjangoJSONEncoder).encode()
+    ).hexdigest()
+
+
+def get_local_content_hashes(Model, pks):
+    """
+    Serialize local objects the same way export does, in one query
+
+    :return: dict of pk -> content hash
+    """
+    return columns.get_content_hashes(Model.objects.filter(pk__in=pks))
+
+
+def diff_batch(Model, serialized_objects):
+    """
+    Match serialized objects with local objects by natural key and content
+    hash, in two queries
+
+    :return: list of (serialized object, natural key, local pk or None,
+        is identical to the local object) tuples, None if natural keys can't
+        be inferred from serialized objects
+    """
+    try:
+        natural_keys = [
+            get_serialized_natural_key(Model, serialized_object['fields'])
+            for serialized_object in serialized_objects
+        ]
+    except NATURAL_KEY_ERRORS:
+        return None
+
+    existing_pks = Model.objects.get_pks_by_natural_keys(natural_keys)
+    local_content_hashes = get_local_content_hashes(
+        Model, existing_pks.values()
+    ) if existing_pks else {}
+
+    diff = []
+    for serialized_object, natural_key in zip(serialized_objects, natural_keys):  # noqa
+        pk = existing_pks.get(natural_key)
+        content_hash = serialized_object.get('hash') or get_content_hash(
+            serialized_object['fields']
+        )
+        diff.append((
+            serialized_object,
+            natural_key,
+            pk,
+            pk is not None and local_content_hashes.get(pk) == content_hash
+        ))
+    return diff
+
+
+def split_unchanged(Model, serialized_objects):
+    """
+    :return: tuple of
+        - serialized objects that are new or differ from the local ones
+        - pks of local objects identical to their serialized object
+        - dict of natural key -> pk of existing local objects, None if
+          natural keys can't be inferred from serialized objects (nothing
+          is skipped then)
+    """
+    diff = diff_batch(Model, serialized_objects)
+    if diff is None:
+        return serialized_objects, [], None
+
+    changed_serialized_objects = []
+    unchanged_pks = []
+    existing_pks = {}
+    for serialized_object, natural_key, pk, is_identical in diff:
+        if pk is not None:
+            existing_pks[natural_key] = pk
+        if is_identical:
+            unchanged_pks.append(pk)
+        else:
+            changed_serialized_objects.append(serialized_object)
+
+    return changed_serialized_objects, unchanged_pks, existing_pks
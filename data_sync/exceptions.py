@@ -1,2 +1,6 @@
 class GrabExportError(Exception):
     pass
+
+
+class PagedExportNotSupported(GrabExportError):
+    """Source env ignores the model parameter of the export"""
@@ -0,0 +1,236 @@
+"""
+Helpers of files_sync, files are downloaded concurrently by a thread pool
+sharing one pooled HTTP session. Files whose size and md5 are the same in
+both env are not downloaded.
+
+Downloads are streamed to a temporary file (in memory up to a threshold)
+then to the storage, and when both env use Google Cloud Storage, files are
+copied bucket to bucket without going through this process at all.
+"""
+import base64
+import logging
+import tempfile
+import time
+
+from django.core.files import File
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger('django.data_sync')
+
+GOOGLE_CLOUD_STORAGE = 'storages.backends.gcloud.GoogleCloudStorage'
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def is_google_cloud_storage(storage):
+    storage_class = type(storage)
+    return any(
+        f'{klass.__module__}.{klass.__qualname__}' == GOOGLE_CLOUD_STORAGE
+        for klass in storage_class.__mro__
+    )
+
+
+class StorageMetadata:
+    """
+    Size and md5 of files of a storage.
+
+    Google Cloud Storage metadata are listed at once when instantiated,
+    for other storages, only the size is known, read file by file when
+    requested. File content is never read.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._listed_metadata = None
+        if is_google_cloud_storage(storage):
+            self._listed_metadata = self._list_google_cloud_storage()
+
+    def _list_google_cloud_storage(self):
+        location = self.storage.location.strip('/')
+        prefix = f'{location}/' if location else ''
+
+        metadata = {}
+        for blob in self.storage.bucket.list_blobs(prefix=prefix or None):
+            # composite objects have no md5
+            md5 = base64.b64decode(blob.md5_hash).hex() if blob.md5_hash else None  # noqa
+            metadata[blob.name[len(prefix):]] = (blob.size, md5)
+        return metadata
+
+    def get(self, name):
+        """
+        :return: tuple of size and md5 hex digest (None if unknown) of the
+            file, None if it does not exist
+        """
+        if self._listed_metadata is not None:
+            return self._listed_metadata.get(name)
+
+        if not self.storage.exists(name):
+            return None
+        return self.storage.size(name), None
+
+
+def is_same_file(metadata, other_metadata):
+    """
+    Same size and md5, md5 is ignored if one of them is unknown
+    """
+    if metadata is None or other_metadata is None:
+        return False
+    size, md5 = metadata
+    other_size, other_md5 = other_metadata
+    if size != other_size:
+        return False
+    return md5 is None or other_md5 is None or md5 == other_md5
+
+
+def get_session(pool_size):
+    """
+    requests.Session keeping up to pool_size connections alive per host
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _join_location(location, name):
+    location = location.strip('/')
+    return f'{location}/{name}' if location else name
+
+
+def copy_google_cloud_storage_file(source_google_cloud_storage, field_file):
+    """
+    Server side copy of the file from source env bucket to field_file
+    storage bucket, bytes never go through this process
+
+    :param source_google_cloud_storage: dict of bucket_name and location of
+        source env Google Cloud Storage
+    :return: size of the file
+    """
+    storage = field_file.storage
+    source_blob = storage.client.bucket(
+        source_google_cloud_storage['bucket_name']
+    ).blob(
+        _join_location(source_google_cloud_storage['location'], field_file.name)  # noqa
+    )
+    destination_blob = storage.bucket.blob(
+        _join_location(storage.location, field_file.name)
+    )
+
+    # large objects or objects across locations need several rewrite calls
+    token, _, size = destination_blob.rewrite(source_blob)
+    while token is not None:
+        token, _, size = destination_blob.rewrite(source_blob, token=token)
+    return size
+
+
+def _download_file(session, url, field_file, spool_max_size):
+    """
+    Stream url content to field_file storage, under field_file name
+
+    :return: size of the file, None if it could not be downloaded or saved
+        under the same name
+    """
+    with session.get(url, timeout=10, stream=True) as r:
+        if not r.ok:
+            logger.warning(f'Failed to download {url}, status {r.status_code}')
+            return None
+
+        size = 0
+        with tempfile.SpooledTemporaryFile(max_size=spool_max_size) as f:
+            for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                size += len(chunk)
+            f.seek(0)
+
+            # replace the outdated file instead of saving under another name,
+            # saved through the storage, field_file.save() would prepend
+            # upload_to to a name that already has it
+            name = field_file.name
+            storage = field_file.storage
+            if storage.exists(name):
+                storage.delete(name)
+            saved_name = storage.save(name, File(f))
+
+    if saved_name != name:
+        # the object would not match the source env anymore
+        logger.warning(f'{name} saved as {saved_name}')
+        return None
+    return size
+
+
+def sync_file(session, media_base_url, field_file, source_metadata=None,
+              storage_metadata=None, source_google_cloud_storage=None,
+              spool_max_size=0):
+    """
+    Download field_file from source env and save it to the storage under the
+    same name, replacing the local file. It fails if the storage picks
+    another name, the model instance is never changed.
+
+    Downloads are buffered in memory up to spool_max_size bytes, then on
+    disk. When source_google_cloud_storage is given and field_file storage
+    is Google Cloud Storage too, the file is copied bucket to bucket instead.
+
+    When source_metadata (size and md5 from the source env manifest) and
+    storage_metadata (StorageMetadata of field_file storage) are given, the
+    file is not downloaded if the local one is the same, and replaced if it
+    differs.
+
+    :return: dict of name, is_synced, is_unchanged, size (bytes) and elapsed
+        (seconds)
+    """
+    name = field_file.name
+    start = time.perf_counter()
+    result = {
+        'name': name,
+        'is_synced': False,
+        'is_unchanged': False,
+        'size': 0
+    }
+
+    local_metadata = None
+    if storage_metadata is not None:
+        local_metadata = storage_metadata.get(name)
+        if is_same_file(local_metadata, source_metadata):
+            result['is_unchanged'] = True
+            result['elapsed'] = time.perf_counter() - start
+            return result
+
+    size = None
+    if (
+        source_google_cloud_storage
+        and is_google_cloud_storage(field_file.storage)
+    ):
+        try:
+            size = copy_google_cloud_storage_file(
+                source_google_cloud_storage, field_file
+            )
+        except Exception as e:
+            # e.g. no read access to the source bucket
+            logger.warning(
+                f'Failed to copy {name} from source bucket, downloading it. '
+                f'{e}'
+            )
+
+    if size is None:
+        size = _download_file(
+            session,
+            f'{media_base_url}/{name}',
+            field_file,
+            spool_max_size=spool_max_size
+        )
+
+    elapsed = time.perf_counter() - start
+    if size is None:
+        result['elapsed'] = elapsed
+        return result
+
+    logger.debug(f'{name} synced, {size} bytes in {elapsed:.2f}s')
+    result.update(
+        is_synced=True,
+        size=size,
+        elapsed=elapsed
+    )
+    return result
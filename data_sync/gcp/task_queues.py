@@ -1,5 +1,6 @@
 import json
 import logging
+import threading
 from urllib.parse import urlparse
 
 from django.conf import settings
@@ -12,25 +13,48 @@ from data_sync import url_constants
 
 logger = logging.getLogger('gcp')
 
+# process wide client, created on first use instead of at module level,
+# at local which usually does not have default creds it can make django
+# starts very slow
+_client = None
+_client_lock = threading.Lock()
 
-def setup_task_queue():
+# whether the data-sync queue is known to exist, checked once per process
+_is_task_queue_ready = False
+
+
+def get_client():
     """
-    Create data-sync task queue if not exist
+    Get the process wide Cloud Tasks client, creating it on first call
     """
-    # duplicated client, kinda a problem if make them module level
-    # at local which usually does not have default creds and can
-    # make django starts very slow
-    client = tasks_v2.CloudTasksClient()
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = tasks_v2.CloudTasksClient()
+    return _client
 
-    queue_name = client.queue_path(
+
+def get_task_queue_path(client):
+    return client.queue_path(
         settings.DATA_SYNC_GOOGLE_CLOUD_PROJECT,
         settings.DATA_SYNC_CLOUD_TASKS_LOCATION,
         settings.DATA_SYNC_CLOUD_TASKS_QUEUE_ID
     )
+
+
+def setup_task_queue():
+    """
+    Create data-sync task queue if not exist
+    """
+    global _is_task_queue_ready
+    client = get_client()
+
+    queue_name = get_task_queue_path(client)
     try:
-        client.get_queue(queue_name)
+        client.get_queue(name=queue_name)
     except NotFound:
-        parent = client.location_path(
+        parent = client.common_location_path(
             settings.DATA_SYNC_GOOGLE_CLOUD_PROJECT,
             settings.DATA_SYNC_CLOUD_TASKS_LOCATION
         )
@@ -52,6 +76,15 @@ def setup_task_queue():
             f'{settings.DATA_SYNC_CLOUD_TASKS_QUEUE_ID}\n'
             f'{r}'
         )
+    _is_task_queue_ready = True
+
+
+def ensure_task_queue():
+    """
+    Same as setup_task_queue but only once per process
+    """
+    if not _is_task_queue_ready:
+        setup_task_queue()
 
 
 def get_cloud_task_handler_url(data_source_base_url):
@@ -88,7 +121,8 @@ def create_run_data_sync_task(data_pull_id, data_source_base_url):
     """
     Calls self version to run data sync
     """
-    setup_task_queue()
+    global _is_task_queue_ready
+    ensure_task_queue()
 
     data = {
         'data_pull_id': data_pull_id,
@@ -107,18 +141,18 @@ def create_run_data_sync_task(data_pull_id, data_source_base_url):
         }
     }
 
-    client = tasks_v2.CloudTasksClient()
-    queue = client.queue_path(
-        settings.DATA_SYNC_GOOGLE_CLOUD_PROJECT,
-        settings.DATA_SYNC_CLOUD_TASKS_LOCATION,
-        settings.DATA_SYNC_CLOUD_TASKS_QUEUE_ID
-    )
-    response = client.create_task(
-        request={
-            'parent': queue,
-            'task': task
-        }
-    )
+    client = get_client()
+    request = {
+        'parent': get_task_queue_path(client),
+        'task': task
+    }
+    try:
+        response = client.create_task(request=request)
+    except NotFound:
+        # queue deleted since it was verified, set it up again
+        _is_task_queue_ready = False
+        setup_task_queue()
+        response = client.create_task(request=request)
 
     logger.info(
         f'Data pull task initiated. ID: {data_pull_id} '
@@ -0,0 +1,78 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+import data_sync
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare django_sync apply modes (per object save vs bulk) by '
+        'applying the local export of registered models onto itself. '
+        'Every run is rolled back, nothing is written.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--empty',
+            action='store_true',
+            help='Delete registered models rows before applying, to '
+                 'benchmark inserts instead of updates'
+        )
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        pulled_data = [
+            json.loads(line)
+            for chunk in data_sync.export_stream()
+            for line in chunk.splitlines()
+        ]
+        self.stdout.write(f'{len(pulled_data)} objects exported')
+
+        for bulk in (False, True):
+            elapsed, query_count = self._run(
+                pulled_data,
+                bulk=bulk,
+                batch_size=options['batch_size'],
+                empty=options['empty']
+            )
+            self.stdout.write(
+                f'{"bulk" if bulk else "save"}: {elapsed:.2f}s, '
+                f'{query_count} queries'
+            )
+
+    @staticmethod
+    def _run(pulled_data, bulk, batch_size, empty):
+        query_count = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal query_count
+            query_count += 1
+            return execute(sql, params, many, context)
+
+        try:
+            with transaction.atomic():
+                if empty:
+                    for Model in reversed(data_sync.registration.sort_dependencies()):  # noqa
+                        Model.objects.all().delete()
+
+                with connection.execute_wrapper(count_queries):
+                    start = time.perf_counter()
+                    # objects are applied onto themselves, none would be
+                    # written if unchanged objects were skipped
+                    data_sync.django_sync(
+                        pulled_data, batch_size=batch_size, bulk=bulk,
+                        skip_unchanged=False
+                    )
+                    elapsed = time.perf_counter() - start
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        return elapsed, query_count
@@ -0,0 +1,71 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from data_sync import backends
+from data_sync.models import DataPull
+
+
+def claim_data_pull():
+    """
+    Mark the oldest QUEUED Data Pull as IN_PROGRESS and return it, None if
+    there is none. Only one of concurrent workers can claim a Data Pull
+    """
+    queued_ids = DataPull.objects.filter(
+        status='QUEUED'
+    ).order_by('time_created', 'id').values_list('id', flat=True)[:10]
+
+    for data_pull_id in queued_ids:
+        is_claimed = DataPull.objects.filter(
+            id=data_pull_id,
+            status='QUEUED'
+        ).update(status='IN_PROGRESS')
+        if is_claimed:
+            return DataPull.objects.select_related('data_source').get(
+                id=data_pull_id
+            )
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Run Data Pulls queued by data_sync.backends.DatabaseBackend, one at '
+        'a time. Start more workers to run more Data Pulls at once.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once there is no queued Data Pull left'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=None,
+            help='Seconds to wait when there is no queued Data Pull, '
+                 'defaults to DATA_SYNC_WORKER_POLL_INTERVAL'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        if interval is None:
+            interval = settings.DATA_SYNC_WORKER_POLL_INTERVAL
+
+        try:
+            while True:
+                close_old_connections()
+                data_pull = claim_data_pull()
+                if data_pull is None:
+                    if options['once']:
+                        break
+                    time.sleep(interval)
+                    continue
+
+                self.stdout.write(f'Running data pull {data_pull.id}')
+                status = backends.run_data_pull(data_pull)
+                self.stdout.write(f'Data pull {data_pull.id} {status}')
+        except KeyboardInterrupt:
+            pass
@@ -1,11 +1,149 @@
+import threading
+from contextlib import contextmanager
+
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Q
+
+
+# natural key -> pk caches per model, only enabled inside natural_key_cache()
+_local = threading.local()
+
+
+@contextmanager
+def natural_key_cache():
+    """
+    Enable natural key -> pk cache of DataSyncEnhancedManager, for the
+    current thread, until the context exits (usually one sync run)
+    """
+    previous_caches = getattr(_local, 'caches', None)
+    if previous_caches is None:
+        _local.caches = {}
+    try:
+        yield
+    finally:
+        _local.caches = previous_caches
+
+
+def get_field_by_path(Model, path):
+    """
+    :param path: natural key path in dot notation e.g. country.code
+    """
+    field = None
+    for name in path.split('.'):
+        field = Model._meta.get_field(name)
+        if field.is_relation:
+            Model = field.remote_field.model
+    return field
 
 
 class DataSyncEnhancedManager(models.Manager):
+    def _get_natural_key_cache(self):
+        caches = getattr(_local, 'caches', None)
+        if caches is None:
+            return None
+        return caches.setdefault(self.model, {})
+
+    def _get_natural_key_lookups(self):
+        return [
+            natural_key.replace('.', '__')
+            for natural_key in self.model._data_sync_natural_key
+        ]
+
+    def to_python_natural_key(self, values):
+        return tuple(
+            get_field_by_path(self.model, natural_key).to_python(value)
+            for natural_key, value
+            in zip(self.model._data_sync_natural_key, values)
+        )
+
+    def get_pks_by_natural_keys(self, natural_keys):
+        """
+        Fetch pks of existing objects matching natural_keys in one query
+
+        :return: dict of natural key tuple -> pk
+        """
+        lookups = self._get_natural_key_lookups()
+
+        # AND of IN per natural key component returns a superset of the
+        # objects, exact matching is done below
+        q = Q()
+        for i, lookup in enumerate(lookups):
+            values = {natural_key[i] for natural_key in natural_keys}
+            component_q = Q(**{f'{lookup}__in': values - {None}})
+            if None in values:
+                component_q |= Q(**{f'{lookup}__isnull': True})
+            q &= component_q
+
+        natural_keys = set(natural_keys)
+        pks = {}
+        for pk, *natural_key in self.filter(q).values_list('pk', *lookups):
+            natural_key = tuple(natural_key)
+            if natural_key in natural_keys:
+                pks[natural_key] = pk
+        return pks
+
+    def warm_natural_key_cache(self, natural_keys):
+        """
+        Resolve natural_keys with a single query and cache them,
+        no-op outside of natural_key_cache()
+        """
+        cache = self._get_natural_key_cache()
+        if cache is None:
+            return
+
+        natural_keys = {
+            self.to_python_natural_key(natural_key)
+            for natural_key in natural_keys
+        }
+        natural_keys.difference_update(cache)
+        if natural_keys:
+            cache.update(self.get_pks_by_natural_keys(natural_keys))
+
+    def cache_natural_keys(self, pks):
+        """
+        :param pks: dict of natural key tuple -> pk, e.g. of created objects
+        """
+        cache = self._get_natural_key_cache()
+        if cache is not None:
+            cache.update(pks)
+
     def get_by_natural_key(self, *args, **kwargs):
+        cache = self._get_natural_key_cache()
+        if cache is not None:
+            try:
+                pk = cache.get(self.to_python_natural_key(args))
+            except ValidationError:
+                pk = None
+            if pk is not None:
+                # other fields are deferred, loaded only when accessed
+                return self.model.from_db(
+                    self.db, [self.model._meta.pk.attname], [pk]
+                )
+
         _kwargs = {
             _natural_key.replace('.', '__'): arg
             for _natural_key, arg
             in zip(self.model._data_sync_natural_key, args)
         }
         return self.get(**_kwargs)
+
+
+def get_natural_key_select_related(Model, field_names):
+    """
+    select_related() lookups needed to serialize natural foreign keys of
+    field_names without fetching related objects one by one
+    """
+    lookups = []
+    for field_name in field_names:
+        field = Model._meta.get_field(field_name)
+        if not (field.many_to_one or field.one_to_one):
+            continue
+
+        lookups.append(field_name)
+        RelatedModel = field.remote_field.model
+        for natural_key in getattr(RelatedModel, '_data_sync_natural_key', ()):
+            related_path = natural_key.split('.')[:-1]
+            if related_path:
+                lookups.append('__'.join([field_name] + related_path))
+    return lookups
@@ -0,0 +1,147 @@
+"""
+Instrumentation of syncs.
+
+SyncMetrics collects counters and timings of the stages of a sync: pull
+(pages, bytes, download time), apply and delete (per model objects inserted,
+updated, unchanged and deleted, queries and elapsed time) and files (files
+synced, bytes, throughput). They are stored on DataPull.metrics and reported
+to DATA_SYNC_METRICS_HOOKS once the sync is done, e.g.
+
+    DATA_SYNC_METRICS_HOOKS = ['data_sync.metrics.log_metric']
+
+A hook is called with the name of a metric, e.g.
+data_sync.apply.catalog.copy.inserted, and its value, so it can be sent to
+StatsD or alike. Source envs report export metrics the same way.
+"""
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger('django.data_sync')
+
+
+class SyncMetrics:
+    """
+    Thread safe counters of a sync, per stage and per stage and model
+    """
+
+    def __init__(self, data=None):
+        """
+        :param data: metrics to add to, see to_dict()
+        """
+        self._lock = threading.Lock()
+        self.stages = defaultdict(Counter)
+        self.models = defaultdict(lambda: defaultdict(Counter))
+        for stage, values in (data or {}).get('stages', {}).items():
+            self.stages[stage].update(values)
+        for stage, models in (data or {}).get('models', {}).items():
+            for label, values in models.items():
+                self.models[stage][label].update(values)
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(json.loads(data) if data else None)
+
+    def add(self, stage, label=None, **values):
+        """
+        Add values to the counters of stage, and of its model label if given
+        """
+        with self._lock:
+            counter = (
+                self.models[stage][label] if label is not None
+                else self.stages[stage]
+            )
+            counter.update(values)
+
+    @contextmanager
+    def measure(self, stage, label=None, using='default'):
+        """
+        Add elapsed seconds and queries run by the current thread on the
+        database using to the counters of stage, and of its model label if
+        given
+        """
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            with connections[using].execute_wrapper(count_queries):
+                yield
+        finally:
+            self.add(
+                stage, label,
+                elapsed=time.perf_counter() - start,
+                queries=queries
+            )
+
+    def to_dict(self):
+        with self._lock:
+            stages = {
+                stage: dict(values) for stage, values in self.stages.items()
+            }
+            models = {
+                stage: {
+                    label: dict(values) for label, values in models.items()
+                }
+                for stage, models in self.models.items()
+            }
+
+        for values in stages.values():
+            if values.get('bytes') and values.get('elapsed'):
+                values['throughput'] = values['bytes'] / values['elapsed']
+        return {'stages': stages, 'models': models}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def report(self):
+        """
+        Call DATA_SYNC_METRICS_HOOKS with every metric
+        """
+        hooks = get_hooks(tuple(settings.DATA_SYNC_METRICS_HOOKS))
+        if not hooks:
+            return
+
+        data = self.to_dict()
+        metrics = [
+            (f'data_sync.{stage}.{name}', value)
+            for stage, values in data['stages'].items()
+            for name, value in values.items()
+        ] + [
+            (f'data_sync.{stage}.{label}.{name}', value)
+            for stage, models in data['models'].items()
+            for label, values in models.items()
+            for name, value in values.items()
+        ]
+        for hook in hooks:
+            for name, value in metrics:
+                try:
+                    hook(name, value)
+                except Exception as e:
+                    # metrics must not fail the sync
+                    logger.warning(e, exc_info=True)
+
+
+@lru_cache(maxsize=None)
+def get_hooks(paths):
+    return [import_string(path) for path in paths]
+
+
+def log_metric(name, value):
+    """
+    Hook logging metrics, see DATA_SYNC_METRICS_HOOKS
+    """
+    logger.info(f'{name}: {value}')
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_sync', '0005_auto_20190603_0710'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=255)),
+                ('natural_key', models.TextField()),
+                ('time_deleted', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='datapull',
+            name='is_incremental',
+            field=models.BooleanField(default=False, help_text='Only pull objects changed or deleted since the last succeeded pull from the same data source. Applies to models registered with updated_field, other models are fully synced'),
+        ),
+        migrations.AddField(
+            model_name='datapull',
+            name='watermark',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Source env time of the export, incremental pulls start from the watermark of the last succeeded pull', null=True),
+        ),
+    ]
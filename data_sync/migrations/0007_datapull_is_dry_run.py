@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_sync', '0006_tombstone_datapull_is_incremental_datapull_watermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datapull',
+            name='is_dry_run',
+            field=models.BooleanField(default=False, help_text='Only compare source env data with this env data, nothing is written. Added, changed and removed objects per model are listed in compare data'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_sync', '0007_datapull_is_dry_run'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='datapull',
+            name='status',
+            field=models.CharField(blank=True, choices=[('', ''), ('QUEUED', 'QUEUED'), ('SUCCEED', 'SUCCEED'), ('IN_PROGRESS', 'IN_PROGRESS'), ('FAILED', 'FAILED')], default='', help_text='status can become stuck/stale at IN_PROGRESS, if you wait long enough but the status does not change from IN_PROGRESS, please do another sync', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_sync', '0008_alter_datapull_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datapull',
+            name='checkpoint',
+            field=models.TextField(blank=True, editable=False, help_text='Progress of the sync, it resumes from there when run again, see data_sync.chunks', null=True),
+        ),
+    ]
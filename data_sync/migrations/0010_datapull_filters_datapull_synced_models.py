@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_sync', '0009_datapull_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datapull',
+            name='filters',
+            field=models.TextField(blank=True, default='', help_text='JSON object of model label -> filter lookups of synced fields, e.g. {"catalog.copy": {"language__code": "en"}}, only matching objects are synced (and deleted if they are not in the source env anymore)'),
+        ),
+        migrations.AddField(
+            model_name='datapull',
+            name='synced_models',
+            field=models.TextField(blank=True, default='', help_text='Labels of the models to sync, e.g. catalog.copy, separated by commas or new lines. Models they depend on are synced too. Leave empty to sync all models'),
+        ),
+    ]
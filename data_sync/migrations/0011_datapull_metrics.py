@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_sync', '0010_datapull_filters_datapull_synced_models'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datapull',
+            name='metrics',
+            field=models.TextField(blank=True, editable=False, help_text='Counters and timings of the stages of the sync: pull, apply and delete per model, files, see data_sync.metrics', null=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_sync', '0011_datapull_metrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessedObject',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=255)),
+                ('object_pk', models.CharField(max_length=255)),
+                ('data_pull', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='data_sync.datapull')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['data_pull', 'model', 'object_pk'], name='data_sync_p_data_pu_546575_idx')],
+            },
+        ),
+    ]
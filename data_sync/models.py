@@ -1,12 +1,13 @@
+import json
 import logging
+import re
 
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 
-import data_sync
-from data_sync import GrabExportError, gcp
-from data_sync import runtime_utils
+from data_sync import backends, registration
 
 
 logger = logging.getLogger('django.data_sync')
@@ -57,11 +58,66 @@ class DataPull(TimeStampedModel):
 
     compare_data = models.TextField(blank=True, null=True)
 
+    is_dry_run = models.BooleanField(
+        default=False,
+        help_text='Only compare source env data with this env data, nothing '
+                  'is written. Added, changed and removed objects per model '
+                  'are listed in compare data'
+    )
+
+    is_incremental = models.BooleanField(
+        default=False,
+        help_text='Only pull objects changed or deleted since the last '
+                  'succeeded pull from the same data source. Applies to '
+                  'models registered with updated_field, other models are '
+                  'fully synced'
+    )
+    synced_models = models.TextField(
+        blank=True,
+        default='',
+        help_text='Labels of the models to sync, e.g. catalog.copy, '
+                  'separated by commas or new lines. Models they depend on '
+                  'are synced too. Leave empty to sync all models'
+    )
+    filters = models.TextField(
+        blank=True,
+        default='',
+        help_text='JSON object of model label -> filter lookups of synced '
+                  'fields, e.g. {"catalog.copy": {"language__code": "en"}}, '
+                  'only matching objects are synced (and deleted if they are '
+                  'not in the source env anymore)'
+    )
+
+    watermark = models.DateTimeField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text='Source env time of the export, incremental pulls start '
+                  'from the watermark of the last succeeded pull'
+    )
+
+    checkpoint = models.TextField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text='Progress of the sync, it resumes from there when run '
+                  'again, see data_sync.chunks'
+    )
+
+    metrics = models.TextField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text='Counters and timings of the stages of the sync: pull, '
+                  'apply and delete per model, files, see data_sync.metrics'
+    )
+
     status = models.CharField(
         default='',
         max_length=20,
         choices=(
             ('', ''),
+            ('QUEUED', 'QUEUED'),
             ('SUCCEED', 'SUCCEED'),
             ('IN_PROGRESS', 'IN_PROGRESS'),
             ('FAILED', 'FAILED')
@@ -72,29 +128,110 @@ class DataPull(TimeStampedModel):
                   ', please do another sync'
     )
 
+    def clean(self):
+        super().clean()
+        try:
+            self.get_scope()
+        except ValueError as e:
+            raise ValidationError(str(e))
+
     def save(self, *args, **kwargs):
         self.status = 'IN_PROGRESS' if not self.status else self.status
         super().save(*args, **kwargs)
 
         if self.status == 'IN_PROGRESS':
-            if runtime_utils.is_in_gae():
-                gcp.task_queues.create_run_data_sync_task(
-                    data_pull_id=self.id,
-                    data_source_base_url=self.data_source.env_url
-                )
-            else:
-                try:
-                    data_sync.run(self.data_source.env_url)
-                except GrabExportError as e:
-                    raise ValidationError(
-                        'Failed to get data from source. Most likely you have '
-                        'invalid Data Source URL. Please refer to docs'
-                    )
-                self.status = 'SUCCEED'
-                self.save()
+            backends.get_backend().enqueue(self)
+
+    def get_since(self):
+        """
+        Watermark of the last succeeded pull from the same data source,
+        None if this pull is not incremental or there is no such pull.
+        Partial pulls (see get_scope()) have no watermark
+        """
+        if not self.is_incremental:
+            return None
+
+        last_data_pull = DataPull.objects.filter(
+            data_source=self.data_source,
+            status='SUCCEED',
+            watermark__isnull=False
+        ).exclude(id=self.id).order_by('-watermark').first()
+        return last_data_pull.watermark if last_data_pull else None
+
+    def get_scope(self):
+        """
+        Models and objects synced by this pull, None if it syncs everything,
+        see data_sync.registration.get_scope()
+        """
+        labels = [
+            label.lower()
+            for label in re.split(r'[\s,]+', self.synced_models or '')
+            if label
+        ]
+        filters = json.loads(self.filters) if self.filters else None
+        return registration.get_scope(labels, filters)
 
     def __str__(self):
         return 'Sync from {} at {}'.format(
             self.data_source,
             self.time_created
         )
+
+
+class Tombstone(models.Model):
+    """
+    Natural key of a deleted object of a model registered with
+    updated_field, exported to incremental pulls
+    """
+    model = models.CharField(max_length=255)
+    natural_key = models.TextField()
+    time_deleted = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return '{} {} deleted at {}'.format(
+            self.model,
+            self.natural_key,
+            self.time_deleted
+        )
+
+
+class ProcessedObject(models.Model):
+    """
+    pk of an object pulled by a chunked Data Pull, staged until objects
+    removed from the source env are deleted, see data_sync.chunks
+    """
+    data_pull = models.ForeignKey(
+        DataPull,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    model = models.CharField(max_length=255)
+    object_pk = models.CharField(max_length=255)
+
+    class Meta:
+        indexes = [models.Index(fields=['data_pull', 'model', 'object_pk'])]
+
+    def __str__(self):
+        return '{} {}'.format(self.model, self.object_pk)
+
+
+def create_tombstones(model, natural_keys):
+    """Same as create_tombstone, for objects deleted without signals"""
+    time_deleted = timezone.now()
+    Tombstone.objects.bulk_create([
+        Tombstone(
+            model=model._meta.label_lower,
+            natural_key=json.dumps(natural_key, cls=DjangoJSONEncoder),
+            time_deleted=time_deleted
+        )
+        for natural_key in natural_keys
+    ])
+
+
+def create_tombstone(sender, instance, **kwargs):
+    """pre_delete receiver, connected to models registered with updated_field"""
+    Tombstone.objects.create(
+        model=sender._meta.label_lower,
+        natural_key=json.dumps(instance.natural_key(), cls=DjangoJSONEncoder),
+        time_deleted=timezone.now()
+    )
@@ -1,6 +1,9 @@
 import abc
 import datetime
 import json
+import re
+import threading
+import time
 
 try:
     from django.utils import timezone
@@ -22,48 +25,45 @@ class Validator(abc.ABC):
     def discovery_url(self):
         raise NotImplementedError
 
-
     @staticmethod
     @abc.abstractmethod
-    def _verify_jwk(token, jwk_sets, audience):
+    def _discover(discovery_url=None):
         """
-        Sets of JWK, already in dict with a "keys" property listing JWK public
-        keys
+        Fetch JWK sets, returns a tuple of JWK sets and the number of seconds
+        they can be cached for
         """
         raise NotImplementedError
 
-    @staticmethod
-    @abc.abstractmethod
-    def _discover(discovery_url=None):
-        raise NotImplementedError
-
     @staticmethod
     @abc.abstractmethod
     def validate(token, email, audience):
         raise NotImplementedError
 
 
-class Google(Validator):
+def _get_max_age(response):
+    """
+    Cache-Control max-age of response, 0 if missing or not cacheable
+    """
+    cache_control = response.headers.get('Cache-Control', '')
+    if 'no-cache' in cache_control or 'no-store' in cache_control:
+        return 0
+    match = re.search(r'max-age=(\d+)', cache_control)
+    return int(match.group(1)) if match else 0
 
-    discovery_url = 'https://accounts.google.com/.well-known/openid-configuration'  # noqa
 
-    @staticmethod
-    def _verify_jwk(token, jwk_sets, audience):
-        claim = None
+class Google(Validator):
 
-        for cert in jwk_sets['keys']:
-            key = RSAAlgorithm.from_jwk(json.dumps(cert))
-            try:
-                claim = jwt.decode(
-                    token, key=key, algorithms=['RS256'], audience=audience
-                )
-            except InvalidSignatureError:
-                continue
+    discovery_url = 'https://accounts.google.com/.well-known/openid-configuration'  # noqa
 
-        if not claim:
-            raise ValueError('No valid public key for this token')
+    # minimum seconds between two refreshes of the keys caused by a token
+    # with an unknown kid
+    min_refresh_interval = 60
 
-        return claim
+    # parsed public keys by kid, valid until _keys_expire_at (monotonic)
+    _keys = {}
+    _keys_expire_at = 0
+    _keys_fetched_at = None
+    _keys_lock = threading.Lock()
 
     @staticmethod
     def _discover(discovery_url=None):
@@ -95,12 +95,57 @@ class Google(Validator):
         except Exception:
             raise ValueError(f'Failed to get public keys. Data {parsed_json}')
 
-        return parsed_json
+        return parsed_json, _get_max_age(r)
+
+    @staticmethod
+    def _get_public_keys(kid):
+        """
+        Parsed public keys for the kid (all of them if kid is None), from
+        cache. Keys are fetched again once expired, or when kid is unknown
+        (Google rotated its keys) at most every min_refresh_interval seconds.
+        """
+        with Google._keys_lock:
+            now = time.monotonic()
+            is_expired = now >= Google._keys_expire_at
+            is_unknown_kid = kid is not None and kid not in Google._keys
+            is_refresh_allowed = (
+                Google._keys_fetched_at is None
+                or now - Google._keys_fetched_at >= Google.min_refresh_interval  # noqa
+            )
+
+            if is_expired or (is_unknown_kid and is_refresh_allowed):
+                jwk_sets, max_age = Google._discover()
+                # replaces the whole cache, rotated out keys are evicted
+                Google._keys = {
+                    cert.get('kid'): RSAAlgorithm.from_jwk(json.dumps(cert))
+                    for cert in jwk_sets['keys']
+                }
+                Google._keys_fetched_at = now
+                Google._keys_expire_at = now + max_age
+
+            if kid is None:
+                return list(Google._keys.values())
+            if kid not in Google._keys:
+                raise ValueError('No valid public key for this token')
+            return [Google._keys[kid]]
+
+    @staticmethod
+    def _verify(token, audience):
+        kid = jwt.get_unverified_header(token).get('kid')
+
+        for key in Google._get_public_keys(kid):
+            try:
+                return jwt.decode(
+                    token, key=key, algorithms=['RS256'], audience=audience
+                )
+            except InvalidSignatureError:
+                continue
+
+        raise ValueError('No valid public key for this token')
 
     @staticmethod
     def validate(token, email, audience):
-        jwk_sets = Google._discover()
-        claim = Google._verify_jwk(token, jwk_sets, audience)
+        claim = Google._verify(token, audience)
 
         if claim['iss'] != 'https://accounts.google.com':
             raise ValueError('Invalid issuer, malicious request')
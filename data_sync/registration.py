@@ -1,18 +1,39 @@
+import threading
+from collections import namedtuple
 from operator import attrgetter
 
 from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import (
+    FieldDoesNotExist, FieldError, ValidationError
+)
 from django.core.serializers import sort_dependencies as _sort_dependencies
 
+from data_sync.bulk import can_bulk_save
 from data_sync.managers import DataSyncEnhancedManager
 
 _registered_models = []
 
+# registered models in dependency order, computed once and reset by
+# register_model, see get_sync_plan()
+_sync_plan = None
+_sync_plan_lock = threading.Lock()
+
+# what a sync needs to know about a registered model
+# fields: names of synced fields, file fields excluded
+# dependencies: registered models it has foreign keys or many to many to
+ModelPlan = namedtuple('ModelPlan', (
+    'model', 'label', 'fields', 'file_fields', 'natural_key',
+    'updated_field', 'dependencies'
+))
+
 
 def get_registered_models():
     return tuple(_registered_models)
 
 
-def register_model(natural_key, fields=None, file_fields=None):
+def register_model(natural_key, fields=None, file_fields=None,
+                   updated_field=None, fast_load=None):
     def _natural_key(self):
         natural_key_values = [
             attrgetter(natural_key)(self)
@@ -22,33 +43,208 @@ def register_model(natural_key, fields=None, file_fields=None):
         return natural_key_values
 
     def Model(model):
+        global _sync_plan
+
         model._data_sync_fields = tuple(fields) if fields else tuple()
         model._data_sync_file_fields = tuple(file_fields) if file_fields else tuple()  # noqa
         model._data_sync_natural_key = natural_key
+        # DateTimeField updated on every change (e.g. auto_now), enables
+        # incremental export of the model
+        model._data_sync_updated_field = updated_field
+        # sync without per row signals, see data_sync.signals, defaults to
+        # DATA_SYNC_FAST_LOAD
+        model._data_sync_fast_load = fast_load
         model.natural_key = _natural_key
         if not isinstance(model.objects, DataSyncEnhancedManager):
             raise ValueError(
                 'default manager is not a class or subclass of '
                 'DataSyncEnhancedManager'
             )
-        _registered_models.append(model)
+        if fast_load and not can_bulk_save(model):
+            raise ValueError(
+                'fast_load is not supported by multi-table inherited models'
+            )
+        with _sync_plan_lock:
+            _registered_models.append(model)
+            _sync_plan = None
         return model
 
     return Model
 
 
-def sort_dependencies():
-    configs = apps.get_app_configs()
-    app_list = (
-        (config, None) for config in configs
+def is_fast_load(model):
+    fast_load = getattr(model, '_data_sync_fast_load', None)
+    if fast_load is None:
+        # models that can't be fast loaded are saved one by one
+        return (
+            settings.DATA_SYNC_FAST_LOAD
+            and can_bulk_save(model)
+        )
+    return fast_load
+
+
+def _get_dependencies(model, registered_models):
+    related_models = [
+        field.remote_field.model
+        for field in model._meta.fields
+        if field.remote_field
+    ] + [
+        field.remote_field.model
+        for field in model._meta.many_to_many
+        if field.remote_field.through._meta.auto_created
+    ]
+    return tuple(
+        related_model
+        for related_model in dict.fromkeys(related_models)
+        if related_model in registered_models and related_model is not model
     )
-    sorted_models = _sort_dependencies(app_list)
 
-    sorted_dependencies = [
-        model
-        for model
-        in sorted_models
-        if model in get_registered_models()
+
+def _build_sync_plan():
+    registered_models = set(_registered_models)
+    # same order as sorting all models of the project then keeping the
+    # registered ones, without going through every model
+    app_list = [
+        (config, [
+            model
+            for model in config.get_models()
+            if model in registered_models
+        ])
+        for config in apps.get_app_configs()
     ]
+    return tuple(
+        ModelPlan(
+            model=model,
+            label=model._meta.label_lower,
+            fields=model._data_sync_fields,
+            file_fields=model._data_sync_file_fields,
+            natural_key=tuple(model._data_sync_natural_key),
+            updated_field=model._data_sync_updated_field,
+            dependencies=_get_dependencies(model, registered_models)
+        )
+        for model in _sort_dependencies(app_list)
+    )
+
+
+def get_sync_plan():
+    """
+    Get ModelPlan of registered models in dependency order, related models
+    first, computed on first call after a model is registered
+    """
+    global _sync_plan
+    sync_plan = _sync_plan
+    if sync_plan is None:
+        with _sync_plan_lock:
+            if _sync_plan is None:
+                _sync_plan = _build_sync_plan()
+            sync_plan = _sync_plan
+    return sync_plan
+
+
+def sort_dependencies():
+    """
+    Registered models in dependency order, see get_sync_plan()
+    """
+    return [model_plan.model for model_plan in get_sync_plan()]
+
+
+def _is_synced_lookup(model_plan, lookup, models):
+    """
+    Whether every field of lookup is synced, relations are followed into
+    registered models only
+
+    :param models: dict of label -> ModelPlan of registered models
+    """
+    for name in lookup.split('__'):
+        if name == 'pk':
+            return True
+        try:
+            field = model_plan.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # a lookup or a transform, e.g. gt or year
+            return True
+        if name not in model_plan.fields + model_plan.file_fields:
+            return False
+        if not field.is_relation:
+            return True
+        model_plan = models.get(field.related_model._meta.label_lower)
+        if model_plan is None:
+            return False
+    return True
+
+
+def check_scope(scope):
+    """
+    Check a partial sync scope, a dict of labels of registered models ->
+    dict of filter lookups of their objects, see get_scope()
+
+    Lookups are limited to synced fields, following relations into the
+    synced fields of registered related models, so that objects can't be
+    filtered on data that is not exported. Raises ValueError if scope is
+    invalid.
+    """
+    if not isinstance(scope, dict):
+        raise ValueError('scope must be a dict of model label -> filters')
+
+    models = {model_plan.label: model_plan for model_plan in get_sync_plan()}
+    for label, filters in scope.items():
+        if label not in models:
+            raise ValueError(f'{label} is not a registered model')
+        if not isinstance(filters, dict):
+            raise ValueError(f'filters of {label} must be a dict')
+
+        model_plan = models[label]
+        for lookup in filters:
+            if not _is_synced_lookup(model_plan, lookup, models):
+                raise ValueError(f'{label} can not be filtered by {lookup}')
+        try:
+            model_plan.model._default_manager.filter(**filters)
+        except (FieldError, ValidationError, TypeError, ValueError) as e:
+            raise ValueError(f'invalid filters of {label}: {e}')
+
+
+def get_scope(labels=None, filters=None):
+    """
+    Scope of a partial sync: dict of label -> filter lookups of the models
+    of labels and, recursively, of the registered models they depend on, in
+    dependency order. Models without filters get an empty dict, all their
+    objects are synced.
+
+    :param labels: labels of models to sync, defaults to all registered
+        models
+    :param filters: dict of label -> filter lookups, e.g.
+        {'catalog.copy': {'language__code': 'en'}}
+    :return: scope, None if every object of every registered model is synced
+    """
+    if not labels and not filters:
+        return None
+
+    models = {model_plan.label: model_plan for model_plan in get_sync_plan()}
+    labels = list(labels or models)
+    unknown_labels = set(labels) - models.keys()
+    if unknown_labels:
+        raise ValueError(
+            f'{", ".join(sorted(unknown_labels))} not registered models'
+        )
+
+    scoped_labels = set()
+    while labels:
+        label = labels.pop()
+        if label not in scoped_labels:
+            scoped_labels.add(label)
+            labels.extend(
+                dependency._meta.label_lower
+                for dependency in models[label].dependencies
+            )
+
+    filters = filters or {}
+    if set(filters) - scoped_labels:
+        raise ValueError('filters of models that are not synced')
 
-    return sorted_dependencies
+    scope = {
+        label: filters.get(label, {})
+        for label in models
+        if label in scoped_labels
+    }
+    check_scope(scope)
+    return scope
@@ -0,0 +1,17 @@
+"""
+Signals sent by data_sync.
+
+Models registered with fast_load=True (all registered models when
+DATA_SYNC_FAST_LOAD is True) are synced without per row signals: objects are
+saved without pre_save / post_save / m2m_changed, and deleted without
+pre_delete / post_delete unless the deletion cascades to other rows.
+data_sync_completed is sent instead, once per model with changes, when they
+are committed, so that receivers can process them in bulk.
+"""
+from django.dispatch import Signal
+
+
+# sender is the model, with arguments:
+# saved_natural_keys: natural keys of created or updated objects
+# deleted_natural_keys: natural keys of deleted objects
+data_sync_completed = Signal()
@@ -1,3 +1,392 @@
-from django.test import TestCase
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from unittest import mock
+
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.db import connection, models
+from django.test import SimpleTestCase, TestCase, override_settings
+from google.api_core.exceptions import NotFound
+
+import jwt
+from jwt.algorithms import RSAAlgorithm
+
+import data_sync
+from data_sync import oidc_validators
+from data_sync.gcp import task_queues
+from data_sync.managers import DataSyncEnhancedManager
+
+
+class _JWKSHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for Google OpenID discovery and JWKS endpoints, see
+    _JWKSServer
+    """
+
+    def do_GET(self):
+        server = self.server
+        if self.path == '/.well-known/openid-configuration':
+            body = {'jwks_uri': f'{server.url}/certs'}
+            headers = {}
+        elif self.path == '/certs':
+            server.jwks_requests += 1
+            body = {'keys': server.jwks}
+            headers = {'Cache-Control': server.cache_control}
+        else:
+            self.send_error(404)
+            return
+
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _JWKSServer(ThreadingHTTPServer):
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _JWKSHandler)
+        self.url = f'http://127.0.0.1:{self.server_address[1]}'
+        self.jwks = []
+        self.jwks_requests = 0
+        self.cache_control = 'public, max-age=3600'
+
+
+def _new_key(kid):
+    private_key = rsa.generate_private_key(
+        public_exponent=65537, key_size=2048
+    )
+    jwk = json.loads(RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update(kid=kid, alg='RS256', use='sig')
+    return private_key, jwk
+
+
+class GoogleValidatorTestCase(SimpleTestCase):
+    email = 'data-sync@example.iam.gserviceaccount.com'
+    audience = 'https://target.example.com'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = _JWKSServer()
+        cls.server_thread = threading.Thread(
+            target=cls.server.serve_forever, daemon=True
+        )
+        cls.server_thread.start()
+        cls.keys = {kid: _new_key(kid) for kid in ('key-1', 'key-2')}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.jwks = [self.keys['key-1'][1]]
+        self.server.jwks_requests = 0
+        self.server.cache_control = 'public, max-age=3600'
+
+        Google = oidc_validators.Google
+        self.addCleanup(
+            setattr, Google, 'discovery_url', Google.discovery_url
+        )
+        Google.discovery_url = (
+            f'{self.server.url}/.well-known/openid-configuration'
+        )
+        Google._keys = {}
+        Google._keys_expire_at = 0
+        Google._keys_fetched_at = None
+
+    def get_token(self, kid, **claims):
+        payload = {
+            'iss': 'https://accounts.google.com',
+            'aud': self.audience,
+            'email': self.email,
+            'email_verified': True,
+            'exp': int(time.time()) + 3600,
+        }
+        payload.update(claims)
+        return jwt.encode(
+            payload, self.keys[kid][0], algorithm='RS256',
+            headers={'kid': kid}
+        )
+
+    def validate(self, token):
+        return oidc_validators.Google.validate(
+            token, self.email, self.audience
+        )
+
+    def test_keys_are_cached(self):
+        self.assertTrue(self.validate(self.get_token('key-1')))
+        self.assertTrue(self.validate(self.get_token('key-1')))
+        self.assertEqual(self.server.jwks_requests, 1)
+
+    def test_keys_are_fetched_again_once_expired(self):
+        self.server.cache_control = 'no-cache'
+        self.validate(self.get_token('key-1'))
+        self.validate(self.get_token('key-1'))
+        self.assertEqual(self.server.jwks_requests, 2)
+
+    def test_unknown_kid_refreshes_keys(self):
+        self.validate(self.get_token('key-1'))
+
+        # rotated keys
+        self.server.jwks = [self.keys['key-2'][1]]
+        oidc_validators.Google._keys_fetched_at -= (
+            oidc_validators.Google.min_refresh_interval
+        )
+        self.assertTrue(self.validate(self.get_token('key-2')))
+        self.assertEqual(self.server.jwks_requests, 2)
+
+        # rotated out keys are evicted
+        with self.assertRaises(ValueError):
+            self.validate(self.get_token('key-1'))
+
+    def test_unknown_kid_refreshes_are_rate_limited(self):
+        self.validate(self.get_token('key-1'))
+
+        self.server.jwks = [self.keys['key-2'][1]]
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                self.validate(self.get_token('key-2'))
+        self.assertEqual(self.server.jwks_requests, 1)
+
+    def test_invalid_email(self):
+        with self.assertRaises(ValueError):
+            self.validate(self.get_token('key-1', email='x@example.com'))
+
+
+class _FakeCloudTasksClient:
+    """
+    Stand-in for tasks_v2.CloudTasksClient, records calls
+    """
+
+    def __init__(self):
+        self.queues = set()
+        self.calls = []
+        # create_task raises NotFound this many times, e.g. queue deleted
+        self.create_task_not_found = 0
+
+    def queue_path(self, project, location, queue):
+        return f'projects/{project}/locations/{location}/queues/{queue}'
+
+    def common_location_path(self, project, location):
+        return f'projects/{project}/locations/{location}'
+
+    def get_queue(self, name):
+        self.calls.append('get_queue')
+        if name not in self.queues:
+            raise NotFound(name)
+        return {'name': name}
+
+    def create_queue(self, parent, queue):
+        self.calls.append('create_queue')
+        self.queues.add(queue['name'])
+        return queue
+
+    def create_task(self, request):
+        self.calls.append('create_task')
+        if self.create_task_not_found:
+            self.create_task_not_found -= 1
+            self.queues.discard(request['parent'])
+            raise NotFound(request['parent'])
+        return request['task']
+
+
+@override_settings(
+    DATA_SYNC_GOOGLE_CLOUD_PROJECT='project',
+    DATA_SYNC_CLOUD_TASKS_LOCATION='europe-west1',
+    DATA_SYNC_CLOUD_TASKS_QUEUE_ID='data-sync',
+    DATA_SYNC_GAE_VERSION='v1',
+    DATA_SYNC_GAE_SERVICE='default',
+    DATA_SYNC_SERVICE_ACCOUNT_EMAIL='data-sync@example.com'
+)
+class TaskQueuesTestCase(SimpleTestCase):
+    data_source_base_url = 'https://source.example.com/data-sync'
+
+    def setUp(self):
+        self.client = _FakeCloudTasksClient()
+        patcher = mock.patch.object(
+            task_queues.tasks_v2, 'CloudTasksClient', return_value=self.client
+        )
+        self.CloudTasksClient = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        for name in ('_client', '_is_task_queue_ready'):
+            self.addCleanup(
+                setattr, task_queues, name, getattr(task_queues, name)
+            )
+        task_queues._client = None
+        task_queues._is_task_queue_ready = False
+
+    def create_task(self, data_pull_id=1):
+        return task_queues.create_run_data_sync_task(
+            data_pull_id, self.data_source_base_url
+        )
+
+    def test_client_is_created_once(self):
+        self.assertIs(task_queues.get_client(), self.client)
+        self.assertIs(task_queues.get_client(), self.client)
+        self.CloudTasksClient.assert_called_once_with()
+
+    def test_queue_is_verified_once(self):
+        self.create_task(1)
+        self.create_task(2)
+        self.assertEqual(self.client.calls, [
+            'get_queue', 'create_queue', 'create_task', 'create_task'
+        ])
+
+    def test_existing_queue_is_not_created(self):
+        self.client.queues.add(
+            task_queues.get_task_queue_path(self.client)
+        )
+        self.create_task()
+        self.assertEqual(self.client.calls, ['get_queue', 'create_task'])
+
+    def test_deleted_queue_is_set_up_again(self):
+        self.create_task(1)
+        self.client.calls = []
+        self.client.create_task_not_found = 1
+
+        task = self.create_task(2)
+        self.assertEqual(self.client.calls, [
+            'create_task', 'get_queue', 'create_queue', 'create_task'
+        ])
+        self.assertEqual(
+            json.loads(task['http_request']['body'])['data_pull_id'], 2
+        )
+        self.assertEqual(
+            task['http_request']['url'],
+            'https://v1-dot-project.appspot.com/data-sync/'
+            + task_queues.url_constants.RUN_DATA_SYNC_GAE_CLOUD_TASKS
+        )
+
+
+@data_sync.register_model(natural_key=['code'], fields=('code', 'name'))
+class PagedItem(models.Model):
+    """
+    Registered model of PagedPullTestCase, its table is created by the test
+    """
+    objects = DataSyncEnhancedManager()
+
+    code = models.CharField(max_length=10, unique=True)
+    name = models.CharField(max_length=50)
+
+    class Meta:
+        app_label = 'data_sync'
+
+
+class _FakeExportResponse:
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.headers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self, chunk_size=None):
+        for line in self.lines:
+            # pages are downloaded in any order
+            time.sleep(random.random() / 1000)
+            yield line
+
+    def close(self):
+        pass
+
+
+class _FakeExportSession:
+    """
+    Stand-in for the source env, serves pages exported beforehand by
+    cursor
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def get(self, url, params=None, **kwargs):
+        return _FakeExportResponse(self.pages[params.get('after')])
+
+    def close(self):
+        pass
+
+
+class PagedPullTestCase(TestCase):
+    label = 'data_sync.pageditem'
+    page_size = 7
+
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as schema_editor:
+            schema_editor.create_model(PagedItem)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as schema_editor:
+            schema_editor.delete_model(PagedItem)
+
+    def setUp(self):
+        PagedItem.objects.bulk_create(
+            PagedItem(code=f'{i:03}', name=f'item {i}') for i in range(100)
+        )
+        self.scope = data_sync.registration.get_scope([self.label])
+
+        # this env is its own source env
+        pages = {}
+        after = None
+        while True:
+            lines = ''.join(data_sync.export_stream(
+                model=self.label, after=after, limit=self.page_size,
+                columns=True, scope=self.scope
+            )).encode().splitlines()
+            pages[after] = lines
+            after = json.loads(lines[0])['cursor']
+            if after is None:
+                break
+        self.assertGreater(len(pages), 10)
+
+        patcher = mock.patch.object(
+            data_sync.files, 'get_session',
+            return_value=_FakeExportSession(pages)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def pull(self):
+        return data_sync.pull_data_paged(
+            'https://source.example.com/data-sync',
+            page_size=self.page_size, concurrency=4, scope=self.scope
+        )
+
+    def test_every_page_is_pulled(self):
+        for _ in range(5):
+            serialized_objects = data_sync._iter_serialized_objects(
+                self.pull(), data_sync._new_export_info()
+            )
+            self.assertEqual(
+                [obj['fields']['code'] for obj in serialized_objects],
+                [f'{i:03}' for i in range(100)]
+            )
+
+    def test_nothing_is_deleted(self):
+        for _ in range(5):
+            data_sync.django_sync(self.pull(), scope=self.scope)
+            self.assertEqual(PagedItem.objects.count(), 100)
@@ -3,4 +3,5 @@
 
 EXPORT = 'data_sync/export'
 EXPORT_FILES_CONFIGURATION = 'data_sync/export/files/configuration'
+EXPORT_FILES_MANIFEST = 'data_sync/export/files/manifest'
 RUN_DATA_SYNC_GAE_CLOUD_TASKS = 'data_sync/run/gae/cloudtasks'
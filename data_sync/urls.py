@@ -8,5 +8,6 @@ app_name = 'data_sync'
 urlpatterns = [
     path(url_constants.EXPORT, views.DataSyncExportAPIView.as_view(), name='export'),
     path(url_constants.EXPORT_FILES_CONFIGURATION, views.DataSyncExportFilesConfigurationView.as_view(), name='export_files_configuration'),  # noqa
+    path(url_constants.EXPORT_FILES_MANIFEST, views.DataSyncExportFilesManifestView.as_view(), name='export_files_manifest'),  # noqa
     path(url_constants.RUN_DATA_SYNC_GAE_CLOUD_TASKS, views.RunDataSyncGAECloudTasks.as_view(), name='run_gae_cloudtasks')  # noqa
 ]
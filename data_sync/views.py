@@ -3,13 +3,16 @@ import json
 import logging
 import traceback
 
+from django.apps import apps as django_apps
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.validators import URLValidator
 from django.http import JsonResponse
+from django.utils.dateparse import parse_datetime
 from django.views import View
 
 import data_sync
-from data_sync import models, oidc_validators
+from data_sync import backends, compression, files, models, oidc_validators
 from data_sync.gcp.task_queues import get_cloud_task_handler_url
 
 url_validator = URLValidator()
@@ -33,11 +36,81 @@ class AuthTokenProtectedMixin:
 
 
 class DataSyncExportAPIView(AuthTokenProtectedMixin, View):
-    """Export insensitive data that are meant to be synced between env"""
+    """
+    Export insensitive data that are meant to be synced between env
+
+    Pass ?format=ndjson to get a streamed response, one serialized object
+    per line, instead of a single JSON list. With ndjson, pass since (ISO
+    8601 datetime) to only get changes since then, and model (a model
+    label) with limit and after (the cursor given by the previous page) to
+    get a page of one model, columns=1 to get the compact columnar format,
+    and scope (JSON object of model label -> filter lookups) to only get
+    some models and objects, see export_stream().
+
+    Responses are compressed according to Accept-Encoding, see
+    data_sync.compression.
+    """
 
     def get(self, request, *args, **kwargs):
+        if request.GET.get('format') == 'ndjson':
+            since = None
+            if request.GET.get('since'):
+                try:
+                    since = parse_datetime(request.GET['since'])
+                except ValueError:
+                    pass
+                if since is None:
+                    errors = {'errors': ['since is not a valid datetime']}
+                    return JsonResponse(data=errors, status=400)
+
+            model = request.GET.get('model') or None
+            after = request.GET.get('after') or None
+            if model is not None and after is not None:
+                try:
+                    django_apps.get_model(model)._meta.pk.to_python(after)
+                except (LookupError, ValueError):
+                    # unknown models export no objects
+                    pass
+                except ValidationError:
+                    errors = {'errors': ['after is not a valid cursor']}
+                    return JsonResponse(data=errors, status=400)
+            try:
+                limit = (
+                    int(request.GET['limit'])
+                    if request.GET.get('limit') else None
+                )
+            except ValueError:
+                limit = 0
+            if limit is not None and limit < 1:
+                errors = {'errors': ['limit must be a positive integer']}
+                return JsonResponse(data=errors, status=400)
+
+            scope = None
+            if request.GET.get('scope'):
+                try:
+                    scope = json.loads(request.GET['scope'])
+                    data_sync.registration.check_scope(scope)
+                except ValueError as e:
+                    errors = {'errors': [f'invalid scope: {e}']}
+                    return JsonResponse(data=errors, status=400)
+
+            return compression.streaming_response(
+                request,
+                data_sync.export_stream(
+                    since=since,
+                    model=model,
+                    after=after,
+                    limit=limit,
+                    columns=bool(request.GET.get('columns')),
+                    scope=scope
+                ),
+                content_type=data_sync.NDJSON_CONTENT_TYPE
+            )
+
         data = data_sync.export()
-        return JsonResponse(data, safe=False)
+        return compression.compress_response(
+            request, JsonResponse(data, safe=False)
+        )
 
 
 class DataSyncExportFilesConfigurationView(AuthTokenProtectedMixin, View):
@@ -45,14 +118,17 @@ class DataSyncExportFilesConfigurationView(AuthTokenProtectedMixin, View):
     Export insensitive settings.
 
     Built to help target env to have correct base media URl to download
-    the files.
+    the files, or the bucket to copy them from when both env use Google
+    Cloud Storage.
     """
 
     # TODO nice to have, move the logic to data_sync module
     def get(self, request, *args, **kwargs):
+        is_google_cloud_storage = getattr(settings, 'DEFAULT_FILE_STORAGE', None) == files.GOOGLE_CLOUD_STORAGE  # noqa
+
         if settings.DATA_SYNC_MEDIA_FILES_BASE_URL:
             media_base_url = settings.DATA_SYNC_MEDIA_FILES_BASE_URL
-        elif settings.DEFAULT_FILE_STORAGE == 'storages.backends.gcloud.GoogleCloudStorage':  # noqa
+        elif is_google_cloud_storage:
             # if you separate env per bucket this could work,
             # if you have prefix then you must specify the above
             media_base_url = 'https://storage.googleapis.com/{}'.format(settings.GS_BUCKET_NAME)  # noqa
@@ -60,9 +136,30 @@ class DataSyncExportFilesConfigurationView(AuthTokenProtectedMixin, View):
             # TODO make this string constant
             media_base_url = 'no_files_sync'
         data = {'media_base_url': media_base_url}
+
+        if is_google_cloud_storage and media_base_url != 'no_files_sync':
+            data['google_cloud_storage'] = {
+                'bucket_name': settings.GS_BUCKET_NAME,
+                'location': getattr(settings, 'GS_LOCATION', '')
+            }
         return JsonResponse(data)
 
 
+class DataSyncExportFilesManifestView(AuthTokenProtectedMixin, View):
+    """
+    Export name, size and md5 of synced files, one file per line.
+
+    Built to help target env to only download missing or changed files.
+    """
+
+    def get(self, request, *args, **kwargs):
+        return compression.streaming_response(
+            request,
+            data_sync.export_files_manifest(),
+            content_type=data_sync.NDJSON_CONTENT_TYPE
+        )
+
+
 class RunDataSyncGAECloudTasks(View):
     def post(self, request):
         errors = {}
@@ -129,15 +226,6 @@ class RunDataSyncGAECloudTasks(View):
             errors = {'errors': 'Failed to validate OIDC'}
             return JsonResponse(data=errors, status=400)
 
-        try:
-            data_sync.run(data['data_source_base_url'])
-        except Exception as e:
-            traceback.format_exc()
-            logger.error(e, exc_info=True)
-            data_pull.status = 'FAILED'
-        else:
-            data_pull.status = 'SUCCEED'
-
-        data_pull.save()
+        backends.run_data_pull(data_pull, data['data_source_base_url'])
 
         return JsonResponse(data={'status': 'created'}, status=201)